@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from input_data import InputData
+from item import Item
+from schedule import Schedule
+
+class BatchResult:
+    def __init__(self, items: list[Item], schedule: Schedule, seconds: float, error: str = None) -> None:
+        """
+        Result of scheduling one shopping list in a batch.
+        schedule is None if scheduling failed, in which case error describes why.
+        """
+        self.items = items
+        self.schedule = schedule
+        self.seconds = seconds
+        self.error = error
+
+    def __repr__(self) -> str:
+        outcome = self.error if self.schedule is None else f"cost {round(self.schedule.cost, 2)}"
+        return f"{self.items}: {outcome} in {round(self.seconds, 4)}s"
+
+# input data shared by all shopping lists in a worker process
+_worker_data = None
+
+def _init_worker(input_data: InputData) -> None:
+    global _worker_data
+    _worker_data = input_data
+
+def _schedule_items(scheduler_cls, scheduler_params: dict, schedule_params: dict, items: list[Item]) -> tuple:
+    # the schedule is returned as records (see Schedule.to_records): its shops refer to the whole catalog
+    start = perf_counter()
+    try:
+        scheduler = scheduler_cls(_worker_data.with_items(items), **scheduler_params)
+        schedule = scheduler.schedule(**schedule_params)
+        return schedule.to_records(), schedule.metrics, perf_counter() - start, None
+    except Exception as e:
+        return None, None, perf_counter() - start, f"{type(e).__name__}: {e}"
+
+class BatchScheduler:
+    def __init__(self, input_data: InputData, scheduler_cls, **scheduler_params) -> None:
+        """
+        Schedules many shopping lists against the same shops, products and routes.
+        -----
+        input_data: InputData
+            Shops, products and routes shared by all shopping lists (its items are not used).
+        scheduler_cls: type
+            Scheduler class used for every shopping list, e.g. Model3Scheduler.
+        scheduler_params:
+            Keyword arguments passed to the scheduler constructor, e.g. tour_constraints.
+        """
+        self._input_data = input_data
+        self._scheduler_cls = scheduler_cls
+        self._scheduler_params = scheduler_params
+
+        # compute route matrices once, so that workers receive them with the input data
+        for name in ("distance_matrix", "route_time_array", "route_cost_array", "route_arcs", "arcs_by_pair"):
+            getattr(input_data, name)
+
+    def schedule(self, shopping_lists: list[list[Item]], processes: int = None, **schedule_params) -> list[BatchResult]:
+        """
+        Schedules all shopping lists and returns their results in the same order.
+        Runs in a pool of processes (default: one per CPU), or in this process if processes is 1.
+        schedule_params are passed to the schedule() method, e.g. kpi_cost or time_limit.
+        """
+        processes = processes if processes is not None else os.cpu_count()
+        args = (self._scheduler_cls, self._scheduler_params, schedule_params)
+        if processes == 1:
+            _init_worker(self._input_data)
+            return [self._result(items, *_schedule_items(*args, items)) for items in shopping_lists]
+
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(self._input_data,)) as pool:
+            futures = [pool.submit(_schedule_items, *args, items) for items in shopping_lists]
+            return [self._result(items, *future.result()) for items, future in zip(shopping_lists, futures)]
+
+    def _result(self, items: list[Item], records: list[tuple], metrics, seconds: float, error: str) -> BatchResult:
+        if records is None:
+            return BatchResult(items, None, seconds, error)
+        return BatchResult(items, Schedule.from_records(records, self._input_data.with_items(items), metrics), seconds)
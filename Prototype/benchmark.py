@@ -0,0 +1,116 @@
+import argparse
+import json
+import pandas as pd
+from tempfile import TemporaryDirectory
+from input_data import InputData
+from data_generator import DataGenerator
+from schedulers import ModelScheduler, BasicScheduler, BestPriceScheduler, Model1Scheduler, Model2Scheduler, Model3Scheduler, HeuristicScheduler
+from validators import ScheduleValidator
+from metrics import Metrics
+from constants import NUM_ITEMS, NUM_PRODUCTS, NUM_ROUTES
+
+# instance size used for all parameters that are not swept
+BASE_PARAMS = {'num_shops': 9, 'num_items': NUM_ITEMS, 'num_products': NUM_PRODUCTS, 'num_routes': NUM_ROUTES}
+
+# parameter values swept (one parameter at a time)
+SWEEPS = {
+    'num_shops': [4, 6, 9, 12],
+    'num_items': [3, 6, 12, 24],
+    'num_products': [50, 150, 400, 1000],
+    'num_routes': [0, 10, 40, 100]
+}
+
+SCHEDULERS = [BasicScheduler, BestPriceScheduler, Model1Scheduler, Model2Scheduler, Model3Scheduler, HeuristicScheduler]
+
+class Benchmark:
+    def __init__(self, sweeps: dict[str, list[int]] = SWEEPS, seeds: list[int] = [0, 1, 2],
+                 schedulers: list = SCHEDULERS, kpi_cost: float = 7, kpi_distance: float = 1,
+                 time_limit: float = 60) -> None:
+        """
+        Runs schedulers on generated instances of increasing size.
+        -----
+        sweeps: dict[str, list[int]]
+            DataGenerator parameter values to sweep; other parameters are taken from BASE_PARAMS.
+        seeds: list[int]
+            Seeds of the instances generated for each parameter value.
+        time_limit: float
+            Solver time limit in seconds for the model schedulers.
+        """
+        self._sweeps = sweeps
+        self._seeds = seeds
+        self._schedulers = schedulers
+        self._kpi_cost = kpi_cost
+        self._kpi_distance = kpi_distance
+        self._time_limit = time_limit
+        self.results = []
+
+    def run(self) -> list[dict]:
+        """
+        Runs all schedulers on all instances and returns one result row per run.
+        The gap of a run is relative to the best objective found on the instance by any scheduler
+        solving the same problem (with or without item quantities).
+        """
+        for parameter, values in self._sweeps.items():
+            for value in values:
+                for seed in self._seeds:
+                    params = dict(BASE_PARAMS, **{parameter: value})
+                    rows = self._run_instance(params, seed)
+                    for row in rows:
+                        row.update({'parameter': parameter, 'value': value})
+                        best = min((other['objective'] for other in rows if other['quantities'] == row['quantities']
+                                    and other['objective'] is not None), default=None)
+                        if row['objective'] is not None and best:
+                            row['gap'] = round((row['objective'] - best) / best, 6)
+                    self.results.extend(rows)
+                    print(f"{parameter}={value}, seed {seed}: " + ", ".join(f"{row['scheduler']} {row['objective']}" for row in rows))
+        return self.results
+
+    def _run_instance(self, params: dict, seed: int) -> list[dict]:
+        with TemporaryDirectory() as path:
+            generator = DataGenerator('shop_names.txt', 'product_names.txt', seed=seed, **params)
+            generator.to_csv(all_items_available=True, path=path + '/')
+            load_metrics = Metrics()
+            input_data = InputData.from_csv(path + '/', load_metrics)
+
+        rows = []
+        for scheduler_cls in self._schedulers:
+            metrics = Metrics()
+            row = dict(params, seed=seed, scheduler=scheduler_cls.__name__, quantities=scheduler_cls.quantities,
+                       objective=None, gap=None, valid=None, error=None)
+            try:
+                schedule = self._run_scheduler(scheduler_cls(input_data, metrics=metrics))
+                row['objective'] = round(self._kpi_cost * schedule.cost + self._kpi_distance * schedule.duration, 4)
+                row['valid'] = all(ScheduleValidator(input_data, schedule).results().values())
+            except Exception as e:
+                row['error'] = f"{type(e).__name__}: {e}"
+            row['load_time'] = load_metrics.timings['load']
+            for phase in ('build', 'solve', 'decode', 'validate'):
+                row[f'{phase}_time'] = metrics.timings.get(phase)
+            row['variables'] = metrics.counts.get('variables')
+            row['constraints'] = metrics.counts.get('constraints')
+            rows.append(row)
+        return rows
+
+    def _run_scheduler(self, scheduler):
+        if isinstance(scheduler, (ModelScheduler, HeuristicScheduler)):
+            return scheduler.schedule(self._kpi_cost, self._kpi_distance, time_limit=self._time_limit)
+        return scheduler.schedule()
+
+    def to_csv(self, path: str) -> None:
+        pd.DataFrame(self.results).to_csv(path, index=False)
+
+    def to_json(self, path: str) -> None:
+        with open(path, 'w') as file:
+            json.dump(self.results, file, indent=1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark all schedulers on generated instances.")
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    parser.add_argument('--time-limit', type=float, default=60)
+    parser.add_argument('--output', default='benchmark', help="output file name without extension")
+    args = parser.parse_args()
+
+    benchmark = Benchmark(seeds=args.seeds, time_limit=args.time_limit)
+    benchmark.run()
+    benchmark.to_csv(args.output + '.csv')
+    benchmark.to_json(args.output + '.json')
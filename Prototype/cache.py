@@ -0,0 +1,245 @@
+import hashlib
+import inspect
+import os
+import pickle
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from time import time
+import numpy as np
+from input_data import InputData
+from schedule import Schedule
+from metrics import measure
+
+def fingerprint(input_data: InputData) -> str:
+    """
+    Returns a canonical hash of the input data a schedule depends on: the origin, the shops and
+    their locations, the offers of the listed items, the routes, the forced shops and whether travel
+    chains routes through a travel table (the table itself is derived from the shops and routes).
+    Shops, items and routes are hashed in name order, so reordering them does not change the hash;
+    any change of a price or stock of a listed item does.
+    """
+    digest = hashlib.sha256()
+    def add(*values):
+        digest.update(repr(values).encode())
+
+    shop_order = sorted(range(len(input_data.shops)), key=lambda j: input_data.shops[j].name)
+    add(tuple(input_data.origin), sorted(input_data.forced_shops), input_data.travel_table is not None)
+    add([(input_data.shops[j].name, tuple(input_data.shops[j].location)) for j in shop_order])
+
+    catalog = input_data.catalog
+    for item in sorted(input_data.items, key=lambda item: item.name):
+        add(item.name, item.quantity)
+        p = catalog.product_ids.get(item.name)
+        if p is not None:
+            digest.update(np.ascontiguousarray(catalog.prices[shop_order, p]).tobytes())
+            digest.update(np.ascontiguousarray(catalog.stocks[shop_order, p]).tobytes())
+
+    names = input_data.routes.shop_names
+    add(sorted(zip([names[k] for k in input_data.routes.shop_from.tolist()], [names[j] for j in input_data.routes.shop_to.tolist()],
+                   input_data.routes.time.tolist(), input_data.routes.cost.tolist())))
+    return digest.hexdigest()
+
+def _canonical(value):
+    # nested dictionaries and lists as sorted and hashable tuples, classes by name
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), _canonical(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_canonical(item) for item in value]
+        return tuple(sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items)
+    if isinstance(value, type):
+        return value.__name__
+    return value
+
+class CacheEntry:
+    def __init__(self, decisions: list[tuple], products: set[str], created: float) -> None:
+        """
+        Cached schedule, stored by name so that it does not refer to the input data it was computed for.
+        -----
+        decisions: list[tuple]
+            Decisions in schedule order (see Schedule.to_records).
+        products: set[str]
+            Names of the items on the shopping list; used to invalidate entries.
+        created: float
+            Time the entry was stored (seconds since the epoch).
+        """
+        self.decisions = decisions
+        self.products = products
+        self.created = created
+
+    @classmethod
+    def from_schedule(cls, schedule: Schedule, products: set[str]):
+        return cls(schedule.to_records(), products, time())
+
+    def to_schedule(self, input_data: InputData, metrics = None) -> Schedule:
+        """
+        Returns the schedule with decisions referring to the items and shops of input_data.
+        """
+        return Schedule.from_records(self.decisions, input_data, metrics)
+
+class CacheBackend(ABC):
+    """
+    Storage of cache entries by key.
+    """
+    @abstractmethod
+    def get(self, key: str) -> CacheEntry:
+        """
+        Returns the entry stored under key, or None.
+        """
+        pass
+
+    @abstractmethod
+    def put(self, key: str, entry: CacheEntry) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def keys(self) -> list[str]:
+        pass
+
+class MemoryBackend(CacheBackend):
+    def __init__(self, max_entries: int = 128) -> None:
+        """
+        Keeps entries in memory, evicting the least recently used entry when full.
+        """
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key: str) -> CacheEntry:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def keys(self) -> list[str]:
+        return list(self._entries)
+
+class DiskBackend(CacheBackend):
+    def __init__(self, directory: str, max_entries: int = 1024) -> None:
+        """
+        Keeps entries as pickle files in directory, so that they outlive the process.
+        When full, the least recently used entry (by file modification time) is evicted.
+        """
+        self._directory = directory
+        self._max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, key + ".pkl")
+
+    def get(self, key: str) -> CacheEntry:
+        try:
+            with open(self._path(key), "rb") as file:
+                entry = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+        os.utime(self._path(key)) # mark as recently used
+        return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        temporary = self._path(key) + f".{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump(entry, file)
+        os.replace(temporary, self._path(key)) # atomic, readers never see a partial entry
+        keys = self.keys()
+        if len(keys) > self._max_entries:
+            keys.sort(key=lambda key: os.path.getmtime(self._path(key)))
+            for key in keys[:len(keys) - self._max_entries]:
+                self.delete(key)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self) -> list[str]:
+        return [name[:-len(".pkl")] for name in os.listdir(self._directory) if name.endswith(".pkl")]
+
+class SolutionCache:
+    def __init__(self, backend: CacheBackend = None, ttl: float = None) -> None:
+        """
+        Cache of schedules keyed by instance fingerprint, scheduler configuration and schedule parameters.
+        -----
+        backend: CacheBackend
+            Storage of the entries; a MemoryBackend if not given.
+        ttl: float
+            Seconds after which an entry expires, or None to keep entries until evicted.
+        """
+        self._backend = backend if backend is not None else MemoryBackend()
+        self._ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, input_data: InputData, config: dict, params: dict) -> str:
+        """
+        Returns the key of a schedule of input_data by a scheduler with the given configuration
+        (see Scheduler.config) and schedule parameters.
+        """
+        return hashlib.sha256(repr((fingerprint(input_data), _canonical(config), _canonical(params))).encode()).hexdigest()
+
+    def get(self, key: str, input_data: InputData, metrics = None) -> Schedule:
+        """
+        Returns the cached schedule, or None if not cached or expired.
+        """
+        entry = self._backend.get(key)
+        if entry is not None and self._ttl is not None and time() - entry.created > self._ttl:
+            self._backend.delete(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.to_schedule(input_data, metrics)
+
+    def put(self, key: str, input_data: InputData, schedule: Schedule) -> None:
+        self._backend.put(key, CacheEntry.from_schedule(schedule, {item.name for item in input_data.items}))
+
+    def invalidate(self, products: set[str] = None) -> None:
+        """
+        Removes the entries of shopping lists containing any of the products, or all entries if not given.
+        Entries never match input data with other prices or stock, but are only removed when evicted;
+        call this when prices or stock change to free them.
+        """
+        for key in self._backend.keys():
+            entry = self._backend.get(key)
+            if entry is not None and (products is None or entry.products & set(products)):
+                self._backend.delete(key)
+
+class CachingScheduler:
+    def __init__(self, scheduler, cache: SolutionCache) -> None:
+        """
+        Returns cached schedules for input data already scheduled with the same scheduler configuration
+        (see Scheduler.config) and schedule parameters; otherwise schedules with scheduler and caches the result.
+        Schedule parameters that are not plain values (e.g. warm_start, on_incumbent) are not part of the key.
+        """
+        self._scheduler = scheduler
+        self._cache = cache
+        self.metrics = scheduler.metrics
+
+    def schedule(self, *args, **kwargs) -> Schedule:
+        arguments = inspect.signature(self._scheduler.schedule).bind(*args, **kwargs)
+        arguments.apply_defaults()
+        params = {name: value for name, value in arguments.arguments.items()
+                  if value is None or isinstance(value, (bool, int, float, str))}
+        input_data = self._scheduler._input_data
+
+        with measure(self.metrics, "cache"):
+            key = self._cache.key(input_data, self._scheduler.config(), params)
+            schedule = self._cache.get(key, input_data, self.metrics)
+        if schedule is not None:
+            return schedule
+        schedule = self._scheduler.schedule(*args, **kwargs)
+        self._cache.put(key, input_data, schedule)
+        return schedule
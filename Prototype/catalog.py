@@ -0,0 +1,130 @@
+import numpy as np
+from collections.abc import Mapping
+from shop import Shop
+
+class Catalog:
+    def __init__(self, shop_names: list[str], product_names: list[str], prices: np.ndarray, stocks: np.ndarray) -> None:
+        """
+        Index of all product offers, built once when the input data is loaded.
+        -----
+        shop_names: list[str]
+            Names of the shops. The position of a shop in the list is its shop id.
+        product_names: list[str]
+            Names of the products. The position of a product in the list is its product id.
+        prices: np.ndarray
+            Prices of the products: (shop id, product id), or nan if not offered.
+        stocks: np.ndarray
+            Stock of the products: (shop id, product id), or 0 if not offered.
+        """
+        self.shop_ids = {name: j for j, name in enumerate(shop_names)}
+        self.product_names = list(product_names)
+        self.product_ids = {name: p for p, name in enumerate(self.product_names)}
+        self.prices = prices
+        self.stocks = stocks
+        self.offered = ~np.isnan(prices)
+        # inverted index: ids of the shops offering each product
+        product, shop = np.nonzero(self.offered.T)
+        self.offer_shops = np.split(shop, np.searchsorted(product, np.arange(1, len(self.product_names))))[:len(self.product_names)]
+
+    @classmethod
+    def from_shops(cls, shops: list[Shop]):
+        """
+        Returns the catalog of the offers in the price and stock dictionaries of the shops.
+        """
+        product_ids = dict()
+        for shop in shops:
+            for product_name in shop.available_products():
+                product_ids.setdefault(product_name, len(product_ids))
+
+        prices = np.full((len(shops), len(product_ids)), np.nan)
+        stocks = np.zeros((len(shops), len(product_ids)), dtype=int)
+        for j, shop in enumerate(shops):
+            for product_name in shop.available_products():
+                prices[j, product_ids[product_name]] = shop.price_by_product[product_name]
+                stocks[j, product_ids[product_name]] = shop.stock_by_product[product_name]
+        return cls([shop.name for shop in shops], list(product_ids), prices, stocks)
+
+    @classmethod
+    def from_offers(cls, shop_names: list[str], product_names: list[str], offer_shop: np.ndarray,
+                    offer_product: np.ndarray, offer_price: np.ndarray, offer_stock: np.ndarray):
+        """
+        Returns the catalog of offers given as columns: shop id, product id, price and stock.
+        """
+        prices = np.full((len(shop_names), len(product_names)), np.nan)
+        stocks = np.zeros((len(shop_names), len(product_names)), dtype=int)
+        prices[offer_shop, offer_product] = offer_price
+        stocks[offer_shop, offer_product] = offer_stock
+        return cls(shop_names, product_names, prices, stocks)
+
+    def offers(self, product_name: str) -> dict[int, tuple[float, int]]:
+        """
+        Returns dictionary of offers of a product: (shop id, (price, stock)).
+        Only the shops offering the product are visited (see offer_shops).
+        """
+        p = self.product_ids.get(product_name)
+        if p is None:
+            return {}
+        shops = self.offer_shops[p]
+        return dict(zip(shops.tolist(), zip(self.prices[shops, p].tolist(), self.stocks[shops, p].tolist())))
+
+    def is_offered(self, shop_id: int, product_name: str) -> bool:
+        """
+        Returns whether the product is offered at the shop with the given id.
+        """
+        p = self.product_ids.get(product_name)
+        return p is not None and bool(self.offered[shop_id, p])
+
+    def get_price(self, shop_id: int, product_name: str, default: float = None) -> float:
+        """
+        Returns the price of the product at the given shop, or default if not offered.
+        """
+        if not self.is_offered(shop_id, product_name):
+            return default
+        return float(self.prices[shop_id, self.product_ids[product_name]])
+
+    def get_stock(self, shop_id: int, product_name: str) -> int:
+        """
+        Returns the stock of the product at the given shop, or 0 if not offered.
+        """
+        if not self.is_offered(shop_id, product_name):
+            return 0
+        return int(self.stocks[shop_id, self.product_ids[product_name]])
+
+    def cheapest_offer(self, product_name: str) -> int:
+        """
+        Returns the id of the shop offering the product at the lowest price, or None if not offered.
+        """
+        p = self.product_ids.get(product_name)
+        if p is None or not self.offered[:, p].any():
+            return None
+        return int(np.nanargmin(self.prices[:, p]))
+
+    def __repr__(self) -> str:
+        return f"Catalog of {len(self.product_ids)} products at {len(self.shop_ids)} shops"
+
+class OfferView(Mapping):
+    __slots__ = ("_catalog", "_shop_id", "_values")
+
+    def __init__(self, catalog: Catalog, shop_id: int, values: np.ndarray) -> None:
+        """
+        Read-only dictionary of the prices or stock of one shop in the catalog: (product name, value).
+        Used as Shop.price_by_product and Shop.stock_by_product without copying the offers.
+        """
+        self._catalog = catalog
+        self._shop_id = shop_id
+        self._values = values
+
+    def __getitem__(self, product_name: str):
+        if not self._catalog.is_offered(self._shop_id, product_name):
+            raise KeyError(product_name)
+        return self._values[self._shop_id, self._catalog.product_ids[product_name]].item()
+
+    def __iter__(self):
+        for p in np.flatnonzero(self._catalog.offered[self._shop_id]):
+            yield self._catalog.product_names[p]
+
+    def __len__(self) -> int:
+        return int(self._catalog.offered[self._shop_id].sum())
+
+    def __repr__(self) -> str:
+        return f"{dict(self)}"
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+def write_npz(file: str, shop_data: pd.DataFrame, product_data: pd.DataFrame,
+              item_data: pd.DataFrame, route_data: pd.DataFrame) -> None:
+    """
+    Writes input data to an uncompressed .npz file of typed columns.
+    -----
+    The DataFrames have the csv layout (see DataGenerator). Shop and product names are
+    dictionary encoded: they are stored once in shop_names and product_names, and offers,
+    items and routes refer to them by integer id.
+    """
+    shop_names = np.asarray(shop_data[0], dtype=str)
+    product_names = np.asarray(pd.unique(pd.concat([product_data[1], item_data[0]])), dtype=str)
+    shop_index = pd.Index(shop_names)
+    product_index = pd.Index(product_names)
+
+    offer_shop = shop_index.get_indexer(product_data[0])
+    route_from = shop_index.get_indexer(route_data[0])
+    route_to = shop_index.get_indexer(route_data[1])
+    if (offer_shop < 0).any() or (route_from < 0).any() or (route_to < 0).any():
+        raise Exception("Encountered unknown shop name")
+
+    np.savez(file,
+             shop_names=shop_names,
+             shop_x=shop_data[1].to_numpy(dtype=float),
+             shop_y=shop_data[2].to_numpy(dtype=float),
+             product_names=product_names,
+             offer_shop=offer_shop.astype(np.int32),
+             offer_product=product_index.get_indexer(product_data[1]).astype(np.int32),
+             offer_price=product_data[2].to_numpy(dtype=float),
+             offer_stock=product_data[3].to_numpy(dtype=np.int64),
+             item_product=product_index.get_indexer(item_data[0]).astype(np.int32),
+             item_quantity=item_data[1].to_numpy(dtype=np.int64),
+             route_from=route_from.astype(np.int32),
+             route_to=route_to.astype(np.int32),
+             route_time=route_data[2].to_numpy(dtype=float),
+             route_cost=route_data[3].to_numpy(dtype=float))
+
+def read_npz(file: str) -> dict[str, np.ndarray]:
+    """
+    Returns dictionary of the columns in a file written by write_npz: (name, array).
+    """
+    with np.load(file) as data:
+        return {name: data[name] for name in data.files}
+
+def csv_to_npz(path: str, file: str) -> None:
+    """
+    Converts the csv input data in path to a .npz file.
+    """
+    frames = [_read_csv(path + name) for name in ('shop_data.csv', 'product_data.csv', 'item_data.csv', 'route_data.csv')]
+    write_npz(file, *frames)
+
+def _read_csv(file: str) -> pd.DataFrame:
+    try:
+        return pd.read_csv(file, header=None, index_col=False)
+    except pd.errors.EmptyDataError: # e.g. no routes besides walking
+        return pd.DataFrame(columns=range(4))
@@ -1,5 +1,10 @@
 M = 120 * 10000 # a very large number!
 
+PRODUCT_CHUNK_SIZE = 100000 # rows of product data read at once when filtering offers
+WALKING_DECIMALS = 2 # walking times are distances rounded to this many decimals
+CLUSTER_SIZE = 20 # maximum number of shops in a cluster of a decomposed instance
+SESSION_CLOSED_RATIO = 1 # closed purchase variables kept by a Model3Session, relative to the variables of its tour model
+
 # data generator defaults
 PRICE_RANGE = (0.1, 20.0)
 STOCK_RANGE = (1, 20)
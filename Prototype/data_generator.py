@@ -1,12 +1,13 @@
+import numpy as np
 import pandas as pd
-import random as rnd
-from math import sqrt
 from constants import *
+from columnar import write_npz
 
 class DataGenerator:
     def __init__(self, shop_names_file: str, product_names_file:str, **params) -> None:
         self.shop_names = open('input/' + shop_names_file).read().split('\n') # add close
         self.product_names= open('input/' + product_names_file).read().split('\n') # add close
+        self._rng = np.random.default_rng(params.get('seed'))
         self._price_range = params.get('price_range', PRICE_RANGE)
         self._stock_range = params.get('stock_range', STOCK_RANGE)
         self._loc_range = params.get('loc_range', LOC_RANGE)
@@ -16,6 +17,11 @@ class DataGenerator:
         self._num_routes = params.get('num_routes', NUM_ROUTES)
         self._travel_cost_range = params.get('travel_cost_range', TRAVEL_COST_RANGE)
 
+        # add generic names if more shops or items are requested than names are available
+        num_shops = params.get('num_shops', len(self.shop_names))
+        self.shop_names = self.shop_names[:num_shops] + [f"Shop{n}" for n in range(len(self.shop_names), num_shops)]
+        self.product_names += [f"Product{n}" for n in range(len(self.product_names), self.num_items)]
+
     def set_num_products(self, num_products):
         self.num_products = num_products
 
@@ -24,103 +30,100 @@ class DataGenerator:
         Generates and returns a DataFrame of product data.
         Format: (shop_name, product_name, price, stock)
         """
-        items = item_data.loc[item_data[0] != "originsauce"].to_numpy()
-        shop_names = self.shop_names.copy()
-        shop_names.remove("origin")
-        product_matrix = {}
+        items = item_data.loc[item_data[0] != "originsauce"]
+        shop_names = np.array(self.shop_names)
+        product_names = np.array(self.product_names)
+        shop_ids = np.flatnonzero(shop_names != "origin")
 
-        # generate specified number of products
-        for _ in range(self.num_products):
-            product_name = rnd.choice(self.product_names)
-            shop_name = rnd.choice(shop_names)
-            quantity = rnd.randrange(self._stock_range[0], self._stock_range[1])
-            if (shop_name, product_name) in product_matrix:
-                product_matrix[(shop_name, product_name)] += quantity
-            else:
-                product_matrix[(shop_name, product_name)] = quantity
+        # generate specified number of products; stock of repeated (shop, product) pairs is summed
+        shops = self._rng.choice(shop_ids, self.num_products)
+        products = self._rng.integers(0, len(product_names), self.num_products)
+        quantities = self._rng.integers(self._stock_range[0], self._stock_range[1], self.num_products)
+        keys, inverse = np.unique(shops * len(product_names) + products, return_inverse=True)
+        stock = np.bincount(inverse, weights=quantities).astype(int)
 
         # conditionally, for each item ensure total stock meets desired quantity
         if all_items_available:
-            for item_name, item_quant in items:
-                current_stock = sum([v for k, v in product_matrix.items() if k[1] == item_name])
-                if current_stock < item_quant:
-                    # pick random shop and make current item fully available there
-                    shop_name = rnd.choice(shop_names)
-                    product_matrix[(shop_name, item_name)] = item_quant
-        
-        # consolidate products into list and add price
-        product_data = []
-        for shop_name, product_name in product_matrix:
-            price = round(rnd.uniform(self._price_range[0], self._price_range[1]), 2)
-            quantity = product_matrix[(shop_name, product_name)]
-            product_data.append((shop_name, product_name, price, quantity))
+            item_products = pd.Index(product_names).get_indexer(items[0])
+            total_stock = np.bincount(keys % len(product_names), weights=stock, minlength=len(product_names))
+            short = total_stock[item_products] < items[1].to_numpy()
+            # pick random shop and make current item fully available there
+            short_keys = self._rng.choice(shop_ids, short.sum()) * len(product_names) + item_products[short]
+            stock_by_key = pd.Series(stock, index=keys)
+            stock_by_key = pd.concat([stock_by_key.drop(short_keys, errors='ignore'),
+                                      pd.Series(items[1].to_numpy()[short], index=short_keys)])
+            keys, stock = stock_by_key.index.to_numpy(), stock_by_key.to_numpy()
 
-        product_data.append(("origin", "originsauce", 0.01, 1)) # add unique product to force origin visit
-        return pd.DataFrame(product_data)
+        # consolidate products and add price
+        prices = np.round(self._rng.uniform(self._price_range[0], self._price_range[1], len(keys)), 2)
+        product_data = pd.DataFrame({0: shop_names[keys // len(product_names)], 1: product_names[keys % len(product_names)],
+                                     2: prices, 3: stock})
+        product_data.loc[len(product_data)] = ("origin", "originsauce", 0.01, 1) # add unique product to force origin visit
+        return product_data
     
     def generate_shop_data(self):
         """
         Generates and returns a DataFrame of shop data.
         Format: (shop_name, (location_x, location_y))
         """
-        shop_data = []
-        for name in self.shop_names:
-            x = round(rnd.uniform(self._loc_range[0], self._loc_range[1]), 4)
-            y = round(rnd.uniform(self._loc_range[0], self._loc_range[1]), 4)
-            shop_data.append((name, x, y))
-        return pd.DataFrame(shop_data)
+        x = np.round(self._rng.uniform(self._loc_range[0], self._loc_range[1], len(self.shop_names)), 4)
+        y = np.round(self._rng.uniform(self._loc_range[0], self._loc_range[1], len(self.shop_names)), 4)
+        return pd.DataFrame({0: self.shop_names, 1: x, 2: y})
     
     def generate_route_data(self, shop_data):
         """
         Generates and returns a DataFrame of route data.
         Requires shop data to have been generated.
+        Walking routes are not generated; InputData computes them from the shop locations.
         Format: (shop_from_name, shop_to_name, time, cost)
         """
-        route_data = []
         shops = shop_data.to_numpy()
 
         if len(shops) < 2 and self._num_routes > 0:
             raise ValueError(f"Cannot generate {self._num_routes} additional routes between {len(shops)} shops.")
 
-        # generate routes by walking
-        for shop_from in shops:
-            for shop_to in shops:
-                time = round(sqrt(pow(shop_from[1] - shop_to[1], 2) + pow(shop_from[2] - shop_to[2], 2)),2)
-                route_data.append((shop_from[0], shop_to[0], time, 0))
-
-        # generate additional routes
-        for _ in range(self._num_routes):
-            shop_from = rnd.choice(shops)
-            shop_to = rnd.choice(shops)
-            while shop_from[0] == shop_to[0]: # only generate route to other shop
-                shop_to = rnd.choice(shops)
-
-            distance = sqrt(pow(shop_from[1] - shop_to[1], 2) + pow(shop_from[2] - shop_to[2], 2))
-            cost = round(rnd.uniform(self._travel_cost_range[0], self._travel_cost_range[1]),2)
-            time = round(distance / cost, 2) # time decreased based on cost
-            route_data.append((shop_from[0], shop_to[0], time, cost))
-        
-        return pd.DataFrame(route_data)
+        # generate additional routes, only to other shops
+        shop_from = self._rng.integers(0, len(shops), self._num_routes)
+        shop_to = (shop_from + self._rng.integers(1, max(len(shops), 2), self._num_routes)) % len(shops)
+        locations = shops[:, 1:].astype(float)
+        distance = np.hypot(*(locations[shop_from] - locations[shop_to]).T)
+        cost = np.round(self._rng.uniform(self._travel_cost_range[0], self._travel_cost_range[1], self._num_routes), 2)
+        time = np.round(distance / cost, 2) # time decreased based on cost
+        return pd.DataFrame({0: shops[shop_from, 0], 1: shops[shop_to, 0], 2: time, 3: cost})
 
     def generate_item_data(self):
         """
         Generates and returns a Dataframe of item data.
         Format: (product_name, quantity)
         """
-        items = rnd.sample(self.product_names, k=self.num_items)
-        item_data = [(name, rnd.randint(1, self._max_item_quant)) for name in items]
-        item_data.append(("originsauce", 1)) # add unique item to force origin visit
-        return pd.DataFrame(item_data)
+        items = self._rng.choice(self.product_names, self.num_items, replace=False)
+        quantities = self._rng.integers(1, self._max_item_quant, self.num_items, endpoint=True)
+        item_data = pd.DataFrame({0: items, 1: quantities})
+        item_data.loc[len(item_data)] = ("originsauce", 1) # add unique item to force origin visit
+        return item_data
 
-    def to_csv(self, all_items_available):
+    def generate(self, all_items_available):
         """
-        Generates data for products, shops, and items, and writes the data to csv files.
+        Generates and returns DataFrames of shop, product, item and route data.
         """
         item_data = self.generate_item_data()
-        item_data.to_csv("input/item_data.csv", header=False, index=False)
         product_data = self.generate_product_data(item_data, all_items_available)
-        product_data.to_csv("input/product_data.csv", header=False, index=False)
         shop_data = self.generate_shop_data()
-        shop_data.to_csv("input/shop_data.csv", header=False, index=False)
         route_data = self.generate_route_data(shop_data)
-        route_data.to_csv("input/route_data.csv", header=False, index=False)
+        return shop_data, product_data, item_data, route_data
+
+    def to_csv(self, all_items_available, path='input/'):
+        """
+        Generates data for products, shops, and items, and writes the data to csv files in path.
+        """
+        shop_data, product_data, item_data, route_data = self.generate(all_items_available)
+        item_data.to_csv(path + "item_data.csv", header=False, index=False)
+        product_data.to_csv(path + "product_data.csv", header=False, index=False)
+        shop_data.to_csv(path + "shop_data.csv", header=False, index=False)
+        route_data.to_csv(path + "route_data.csv", header=False, index=False)
+
+    def to_npz(self, all_items_available, file='input/input_data.npz'):
+        """
+        Generates data for products, shops, and items, and writes the data to a .npz file.
+        """
+        write_npz(file, *self.generate(all_items_available))
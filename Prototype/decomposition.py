@@ -0,0 +1,280 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from input_data import InputData
+from item import Item
+from shop import Shop
+from schedule import Schedule, ShopDecision, TravelDecision
+from schedulers import Scheduler, Model3Scheduler
+from heuristic import cheapest_purchases
+from metrics import Metrics, measure
+from constants import CLUSTER_SIZE
+
+class DecompositionReport:
+    def __init__(self, clusters: int, subproblems: int, objective: float, lower_bound: float) -> None:
+        """
+        Summary of a decomposed schedule.
+        lower_bound is a lower bound on the objective of any schedule (see DecompositionScheduler._lower_bound),
+        so objective - lower_bound bounds the loss from decomposing.
+        """
+        self.clusters = clusters
+        self.subproblems = subproblems
+        self.objective = objective
+        self.lower_bound = lower_bound
+        self.max_loss = objective - lower_bound
+        self.max_relative_loss = self.max_loss / objective if objective else 0
+
+    def __repr__(self) -> str:
+        return (f"{self.subproblems} of {self.clusters} clusters solved; objective {round(self.objective, 4)}, "
+                f"lower bound {round(self.lower_bound, 4)}, loss at most {round(100 * self.max_relative_loss, 2)}%")
+
+def cluster_shops(locations: np.ndarray, cluster_size: int = CLUSTER_SIZE, seed: int = 0) -> list[np.ndarray]:
+    """
+    Returns clusters of at most cluster_size locations, as arrays of indices into locations.
+    Locations are clustered by k-means, and clusters that are too large are clustered again.
+    """
+    rng = np.random.default_rng(seed)
+    clusters = []
+    pending = [np.arange(len(locations))]
+    while pending:
+        indices = pending.pop()
+        if len(indices) <= cluster_size:
+            clusters.append(indices)
+            continue
+        labels = _k_means(locations[indices], -(-len(indices) // cluster_size), rng)
+        parts = [indices[labels == c] for c in np.unique(labels)]
+        if len(parts) == 1: # coinciding locations: split in halves
+            parts = [indices[:len(indices) // 2], indices[len(indices) // 2:]]
+        pending.extend(parts)
+    return clusters
+
+def _k_means(points: np.ndarray, k: int, rng: np.random.Generator, iterations: int = 50) -> np.ndarray:
+    # k-means++ seeding followed by Lloyd iterations; returns the cluster label of each point
+    centers = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        distance = ((points[:, np.newaxis] - np.array(centers)) ** 2).sum(axis=2).min(axis=1)
+        if distance.sum() == 0:
+            break
+        centers.append(points[rng.choice(len(points), p=distance / distance.sum())])
+    centers = np.array(centers)
+    labels = np.zeros(len(points), dtype=int)
+    for _ in range(iterations):
+        new_labels = ((points[:, np.newaxis] - centers) ** 2).sum(axis=2).argmin(axis=1)
+        if (new_labels == labels).all() and _ > 0:
+            break
+        labels = new_labels
+        for c in range(len(centers)):
+            if (labels == c).any():
+                centers[c] = points[labels == c].mean(axis=0)
+    return labels
+
+def _solve_cluster(scheduler_cls, scheduler_params: dict, schedule_params: dict, input_data: InputData) -> list[tuple]:
+    return scheduler_cls(input_data, **scheduler_params).schedule(**schedule_params).to_records()
+
+class DecompositionScheduler(Scheduler):
+    """
+    Schedules city-scale instances by decomposing them into clusters of nearby shops.
+    -----
+    Shops are clustered by location. The clusters to visit are chosen greedily (most demand covered
+    per unit of estimated purchase and travel cost), and each item is bought at the cheapest offers of
+    the chosen clusters within stock. The purchases and sub-tour of each cluster are then scheduled
+    independently, in parallel, and the sub-tours are stitched together: clusters are ordered by
+    nearest neighbour, and consecutive sub-tours are joined by walking from the last shop of one to
+    the first shop of the next if this is cheaper than returning to the origin in between.
+    Takes item quantities and stock into account, like model3.
+    """
+    quantities = True
+
+    def __init__(self, input_data: InputData, scheduler_cls = Model3Scheduler, scheduler_params: dict = None,
+                 cluster_size: int = CLUSTER_SIZE, processes: int = None, seed: int = 0, metrics: Metrics = None) -> None:
+        """
+        scheduler_cls: type
+            Scheduler for the clusters, e.g. Model3Scheduler or HeuristicScheduler.
+        scheduler_params: dict
+            Keyword arguments passed to the scheduler constructor, e.g. tour_constraints.
+        cluster_size: int
+            Maximum number of shops in a cluster (the origin excluded).
+        processes: int
+            Number of processes solving clusters (default: one per CPU); 1 solves in this process.
+        """
+        super().__init__(input_data, metrics)
+        self._scheduler_cls = scheduler_cls
+        self._scheduler_params = scheduler_params or {}
+        self._cluster_size = cluster_size
+        self._processes = processes if processes is not None else os.cpu_count()
+        self._seed = seed
+        self._origin = input_data.get_shop_index("origin")
+        self.report = None
+
+    def config(self) -> dict:
+        return dict(super().config(), scheduler_cls=self._scheduler_cls.__name__, scheduler_params=self._scheduler_params,
+                    cluster_size=self._cluster_size, seed=self._seed)
+
+    def schedule(self, kpi_cost=1, kpi_distance=1, time_limit=None) -> Schedule:
+        """
+        Returns the stitched schedule; time_limit applies to each cluster. A DecompositionReport is stored in self.report.
+        """
+        data = self._input_data
+        with measure(self.metrics, "build"):
+            shops = np.array([j for j in range(len(data.shops)) if j != self._origin], dtype=int)
+            locations = np.array([data.shops[j].location for j in shops], dtype=float).reshape(-1, 2)
+            clusters = [shops[c] for c in cluster_shops(locations, self._cluster_size, self._seed)]
+            amounts = self._purchases(clusters, kpi_cost, kpi_distance)
+            forced = [data.get_shop_index(name) for name in data.forced_shops]
+            subproblems = [self._subproblem(cluster, amounts) for cluster in clusters
+                           if amounts[:, cluster].any() or np.isin(forced, cluster).any()]
+
+        with measure(self.metrics, "solve"):
+            args = (self._scheduler_cls, self._scheduler_params,
+                    {"kpi_cost": kpi_cost, "kpi_distance": kpi_distance, "time_limit": time_limit})
+            if self._processes == 1 or len(subproblems) <= 1:
+                tours = [_solve_cluster(*args, subproblem) for subproblem in subproblems]
+            else:
+                with ProcessPoolExecutor(min(self._processes, len(subproblems))) as pool:
+                    futures = [pool.submit(_solve_cluster, *args, subproblem) for subproblem in subproblems]
+                    tours = [future.result() for future in futures]
+
+        with measure(self.metrics, "decode"):
+            schedule = self._stitch([Schedule.from_records(tour, data) for tour in tours], amounts, kpi_cost, kpi_distance)
+
+        objective = kpi_cost * schedule.cost + kpi_distance * schedule.duration
+        lower_bound = self._lower_bound(kpi_cost, kpi_distance)
+        self.report = DecompositionReport(len(clusters), len(subproblems), objective, lower_bound)
+        return schedule
+
+    def _purchases(self, clusters: list[np.ndarray], kpi_cost: float, kpi_distance: float) -> np.ndarray:
+        """
+        Returns array of quantities to purchase: (item, shop), from the origin and the chosen clusters.
+        """
+        data = self._input_data
+        prices = data.price_matrix
+        stock = np.where(data.offer_matrix, data.stock_matrix, 0)
+        quantities = np.array([item.quantity for item in data.items], dtype=int)
+        shops_by_price = np.argsort(prices, axis=1, kind="stable")
+        forced = set(data.get_shop_index(name) for name in data.forced_shops)
+
+        # estimated round trip to a cluster: walking from the origin to its nearest shop and back
+        visit_cost = [kpi_distance * 2 * data.walking_times(self._origin, cluster).min() for cluster in clusters]
+        cluster_stock = np.stack([stock[:, cluster].sum(axis=1) for cluster in clusters], axis=1)
+        cluster_price = np.stack([np.where(stock[:, cluster] > 0, prices[:, cluster], np.inf).min(axis=1) for cluster in clusters], axis=1)
+
+        def purchases(chosen: set[int]) -> np.ndarray:
+            visited = np.zeros(len(data.shops), dtype=bool)
+            visited[[self._origin] + [j for c in chosen for j in clusters[c]]] = True
+            return cheapest_purchases(shops_by_price, np.where(visited, stock, 0), quantities)
+
+        def estimate(chosen: set[int]) -> float:
+            amounts = purchases(chosen)
+            if (amounts.sum(axis=1) < quantities).any():
+                return np.inf
+            return kpi_cost * (amounts * np.where(amounts > 0, prices, 0)).sum() + sum(visit_cost[c] for c in chosen)
+
+        # greedy cover: open clusters with forced shops, then the cluster covering most demand per unit of cost
+        fixed = {c for c, cluster in enumerate(clusters) if forced & set(cluster.tolist())}
+        chosen = set(fixed)
+        remaining = quantities - stock[:, self._origin] - cluster_stock[:, sorted(chosen)].sum(axis=1)
+        while (remaining > 0).any():
+            best_cluster, best_ratio = None, np.inf
+            for c in range(len(clusters)):
+                covered = np.minimum(np.maximum(remaining, 0), cluster_stock[:, c])
+                if c in chosen or covered.sum() == 0:
+                    continue
+                ratio = (kpi_cost * (covered * np.where(covered > 0, cluster_price[:, c], 0)).sum() + visit_cost[c]) / covered.sum()
+                if ratio < best_ratio:
+                    best_cluster, best_ratio = c, ratio
+            if best_cluster is None:
+                raise ValueError("Shopping list cannot be completed with the given shops.")
+            chosen.add(best_cluster)
+            remaining -= cluster_stock[:, best_cluster]
+
+        # local search: open or close single clusters while this lowers the estimated objective
+        best = estimate(chosen)
+        improved = True
+        while improved:
+            improved = False
+            for c in range(len(clusters)):
+                if c in fixed or (c not in chosen and not cluster_stock[:, c].any()):
+                    continue
+                value = estimate(chosen ^ {c})
+                if value < best - 1e-9:
+                    chosen, best, improved = chosen ^ {c}, value, True
+        return purchases(chosen)
+
+    def _lower_bound(self, kpi_cost: float, kpi_distance: float) -> float:
+        """
+        Returns a lower bound on the objective of any schedule: the cheapest purchase of the shopping
+        list and, if the origin cannot supply it, the cheapest arcs out of and back into the origin.
+        """
+        data = self._input_data
+        stock = np.where(data.offer_matrix, data.stock_matrix, 0)
+        quantities = np.array([item.quantity for item in data.items], dtype=int)
+        amounts = cheapest_purchases(np.argsort(data.price_matrix, axis=1, kind="stable"), stock, quantities)
+        bound = kpi_cost * float((amounts * np.where(amounts > 0, data.price_matrix, 0)).sum())
+        if (stock[:, self._origin] < quantities).any() and len(data.shops) > 1:
+            others = np.array([j for j in range(len(data.shops)) if j != self._origin], dtype=int)
+            routes = data.routes
+            weights = kpi_cost * routes.cost + kpi_distance * routes.time
+            walk = kpi_distance * data.walking_times(self._origin, others).min()
+            leave = weights[(routes.shop_from == self._origin) & (routes.shop_to != self._origin)].min(initial=walk)
+            enter = weights[(routes.shop_to == self._origin) & (routes.shop_from != self._origin)].min(initial=walk)
+            bound += min(walk, leave) + min(walk, enter)
+        return bound
+
+    def _subproblem(self, cluster: np.ndarray, amounts: np.ndarray) -> InputData:
+        """
+        Returns the input data of a cluster: the origin (without offers) and the shops of the cluster,
+        with offers of the items purchased in the cluster only, and the routes between them.
+        The forced shops of the cluster remain forced.
+        """
+        data = self._input_data
+        origin = data.shops[self._origin]
+        listed = [i for i in range(len(data.items)) if amounts[i, cluster].any()]
+        shops = [Shop(origin.name, origin.location, {}, {})]
+        for j in cluster.tolist():
+            shop = data.shops[j]
+            offered = [data.items[i].name for i in listed if data.offer_matrix[i, j]]
+            shops.append(Shop(shop.name, shop.location,
+                              {name: shop.price_by_product[name] for name in offered},
+                              {name: shop.stock_by_product[name] for name in offered}))
+        items = [Item(data.items[i].name, int(amounts[i, cluster].sum())) for i in listed]
+        members = np.zeros(len(data.shops), dtype=bool)
+        members[cluster] = True
+        members[self._origin] = True
+        routes = data.routes.select(members[data.routes.shop_from] & members[data.routes.shop_to])
+        routes = [route for route in routes] # renumbered against the shops of the cluster
+        forced = {origin.name} | (set(data.forced_shops) & {shop.name for shop in shops})
+        return InputData(data.origin, shops, items, routes, forced_shops=forced)
+
+    def _stitch(self, tours: list[Schedule], amounts: np.ndarray, kpi_cost: float, kpi_distance: float) -> Schedule:
+        """
+        Returns the schedule purchasing at the origin and then following the sub-tours in nearest neighbour order.
+        """
+        data = self._input_data
+        origin = data.shops[self._origin]
+        def weight(route):
+            return kpi_cost * route.cost + kpi_distance * route.time
+
+        decisions = [ShopDecision(item, origin, int(amounts[i, self._origin]))
+                     for i, item in enumerate(data.items) if amounts[i, self._origin] > 0]
+        tours = [tour.decisions for tour in tours if tour.travel_decisions]
+        current = None # last shop of the previous sub-tour, None at the origin
+        while tours:
+            if current is None:
+                following = min(tours, key=lambda tour: weight(tour[0].route))
+            else:
+                following = min(tours, key=lambda tour: weight(data.get_walking_route(current.route.shop_from, tour[0].route.shop_to)))
+            tours.remove(following)
+            if current is not None:
+                shop_from, shop_to = current.route.shop_from, following[0].route.shop_to
+                walk = data.get_walking_route(shop_from, shop_to)
+                if weight(walk) < weight(current.route) + weight(following[0].route):
+                    following = [TravelDecision(walk)] + following[1:]
+                else:
+                    decisions.append(current)
+            decisions.extend(following[:-1])
+            current = following[-1] # travel back to the origin, kept if no sub-tour follows
+        if current is not None:
+            decisions.append(current)
+        else:
+            decisions.append(TravelDecision(data.get_walking_route(origin.name, origin.name)))
+        return Schedule(data.origin, decisions, self.metrics)
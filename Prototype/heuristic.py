@@ -0,0 +1,205 @@
+import numpy as np
+from time import perf_counter
+from input_data import InputData
+from tour import Tour, best_routes
+
+def cheapest_purchases(shops_by_price: np.ndarray, stock: np.ndarray, quantities: np.ndarray) -> np.ndarray:
+    """
+    Returns array of purchased quantities: (item, shop), buying each item at its shops in order of
+    price (shops_by_price: (item, rank) -> shop) within stock until its quantity is covered.
+    Items without enough stock are purchased as far as the stock allows.
+    """
+    # take what remains after the cheaper shops
+    sorted_stock = np.take_along_axis(stock, shops_by_price, axis=1)
+    before = np.cumsum(sorted_stock, axis=1) - sorted_stock
+    amounts = np.zeros(stock.shape, dtype=int)
+    np.put_along_axis(amounts, shops_by_price, np.clip(quantities[:, np.newaxis] - before, 0, sorted_stock), axis=1)
+    return amounts
+
+class LocalSearch:
+    def __init__(self, input_data: InputData, kpi_cost: float, kpi_distance: float) -> None:
+        """
+        Construction and local search heuristic for the model3 problem.
+        -----
+        A solution is a tour of shop indices (origin excluded). For a given set of visited
+        shops, each item is purchased at the cheapest visited shops within stock, which is
+        optimal for that set; item reassignment is therefore implied by every move.
+        Between two shops the route with the lowest weighted time and cost is taken.
+        Moves are made on a Tour, which gives the change of travel of a move without recomputing the tour.
+        """
+        self._input_data = input_data
+        self._kpi_cost = kpi_cost
+        self._kpi_distance = kpi_distance
+        self._deadline = None
+
+        num_shops = len(input_data.shops)
+        self._prices = input_data.price_matrix
+        self._stock = np.where(input_data.offer_matrix, input_data.stock_matrix, 0)
+        self._quantities = np.array([item.quantity for item in input_data.items], dtype=int)
+        self._shops_by_price = np.argsort(self._prices, axis=1, kind="stable") # (item, rank) -> shop
+        self._forced = set(input_data.get_shop_index(name) for name in input_data.forced_shops)
+        self._forced.discard(0)
+
+        # cheapest hop between two shops: weight and route number, inf if no route exists
+        self.hop, self.hop_route = best_routes(input_data, kpi_cost, kpi_distance)
+        shops = np.arange(num_shops)
+        self.hop[shops, shops] = np.inf # no self-loops
+        self.hop_route[~np.isfinite(self.hop)] = -1
+
+    def solve(self, time_limit: float = None) -> list[int]:
+        """
+        Returns the best tour found within time_limit seconds (no limit if None).
+        """
+        self._deadline = perf_counter() + time_limit if time_limit is not None else None
+        tour = self._tour(self._construct())
+        improved = True
+        while improved and not self._out_of_time():
+            improved = self._two_opt(tour) | self._remove_shops(tour) | self._insert_shops(tour)
+        return tour.shops
+
+    def best_price_tour(self, time_limit: float = None) -> list[int]:
+        """
+        Returns a tour through the cheapest shops of the items, ordered by 2-opt within time_limit seconds.
+        Each item is bought at its cheapest shops, in order of price, until its quantity is covered.
+        """
+        self._deadline = perf_counter() + time_limit if time_limit is not None else None
+        shops = set(self._forced)
+        for i, quantity in enumerate(self._quantities):
+            for j in self._shops_by_price[i]:
+                if quantity <= 0:
+                    break
+                if self._stock[i, j] > 0:
+                    shops.add(int(j))
+                    quantity -= self._stock[i, j]
+            if quantity > 0:
+                raise ValueError("Shopping list cannot be completed with the given shops.")
+        shops.discard(0)
+        tour = self._tour(self._nearest_neighbour(shops))
+        while self._two_opt(tour) and not self._out_of_time():
+            pass
+        return tour.shops
+
+    def purchases(self, tour: list[int]) -> np.ndarray:
+        """
+        Returns array of purchased quantities: (item, shop), or None if the shops in the tour
+        cannot supply the whole shopping list.
+        """
+        visited = np.zeros(len(self._input_data.shops), dtype=bool)
+        visited[0] = True
+        visited[tour] = True
+        stock = self._stock * visited
+        if (stock.sum(axis=1) < self._quantities).any():
+            return None
+        return cheapest_purchases(self._shops_by_price, stock, self._quantities)
+
+    def objective(self, tour: list[int]) -> float:
+        """
+        Returns the model3 objective value of the tour, or inf if it is infeasible.
+        """
+        return self._purchase_value(tour) + self.travel(tour)
+
+    def travel(self, tour: list[int]) -> float:
+        """
+        Returns the weighted travel time and cost of the tour, starting and ending at the origin.
+        """
+        stops = [0] + tour + [0]
+        return self.hop[stops[:-1], stops[1:]].sum()
+
+    def _purchase_value(self, tour: list[int]) -> float:
+        # weighted cost of the purchases of the tour, inf if it is infeasible
+        amounts = self.purchases(tour)
+        if amounts is None:
+            return np.inf
+        return self._kpi_cost * (amounts * self._prices).sum()
+
+    def _tour(self, shops: list[int]) -> Tour:
+        # travel only; purchases depend on all visited shops and are priced by _purchase_value
+        return Tour(self._input_data, shops, kpi_cost=self._kpi_cost, kpi_distance=self._kpi_distance)
+
+    def _value(self, delta: tuple[float, float]) -> float:
+        return self._kpi_cost * delta[0] + self._kpi_distance * delta[1]
+
+    def _out_of_time(self) -> bool:
+        return self._deadline is not None and perf_counter() > self._deadline
+
+    def _construct(self) -> list[int]:
+        # greedy set cover: add the shop covering most remaining demand per unit of cost
+        shops = set(self._forced)
+        remaining = self._quantities - self._supply(shops)
+        while (remaining > 0).any():
+            # all candidate shops at once: demand covered and its cost including the trip from and to the origin
+            covered = np.minimum(np.maximum(remaining, 0)[:, np.newaxis], self._stock)
+            amount = covered.sum(axis=0)
+            candidates = amount > 0
+            candidates[0] = False
+            candidates[sorted(shops)] = False
+            if not candidates.any():
+                raise ValueError("Shopping list cannot be completed with the given shops.")
+            cost = self._kpi_cost * (covered * np.where(self._stock > 0, self._prices, 0)).sum(axis=0) + self.hop[0] + self.hop[:, 0]
+            ratio = np.where(candidates, cost / np.maximum(amount, 1), np.inf)
+            shops.add(int(np.argmin(ratio)))
+            remaining = self._quantities - self._supply(shops)
+
+        return self._nearest_neighbour(shops)
+
+    def _nearest_neighbour(self, shops: set[int]) -> list[int]:
+        # nearest neighbour tour through the given shops
+        shops, tour, current = set(shops), [], 0
+        while shops:
+            current = min(sorted(shops), key=lambda j: self.hop[current, j])
+            tour.append(current)
+            shops.remove(current)
+        return tour
+
+    def _supply(self, shops: set[int]) -> np.ndarray:
+        return self._stock[:, [0] + sorted(shops)].sum(axis=1)
+
+    def _two_opt(self, tour: Tour) -> bool:
+        # reverse tour segments while this shortens the (possibly asymmetric) tour
+        improved = False
+        for a in range(len(tour) - 1):
+            for b in range(a + 1, len(tour)):
+                if self._value(tour.delta_reverse(a, b)) < -1e-9:
+                    tour.reverse(a, b)
+                    improved = True
+                if self._out_of_time():
+                    return improved
+        return improved
+
+    def _remove_shops(self, tour: Tour) -> bool:
+        improved = False
+        purchase_value = self._purchase_value(tour.shops)
+        for shop in tour.shops:
+            if shop in self._forced:
+                continue
+            shops = tour.shops
+            index = shops.index(shop)
+            value = self._purchase_value(shops[:index] + shops[index + 1:])
+            if value - purchase_value + self._value(tour.delta_remove(index)) < -1e-9:
+                tour.remove(index)
+                purchase_value = value
+                improved = True
+            if self._out_of_time():
+                break
+        return improved
+
+    def _insert_shops(self, tour: Tour) -> bool:
+        # insert an unvisited shop with relevant offers at its cheapest position
+        improved = False
+        purchase_value = self._purchase_value(tour.shops)
+        visited = set(tour.shops)
+        for shop in range(1, len(self._input_data.shops)):
+            if shop in visited or not self._stock[:, shop].any():
+                continue
+            stops = tour.stops
+            position = int(np.argmin(self.hop[stops[:-1], shop] + self.hop[shop, stops[1:]] - self.hop[stops[:-1], stops[1:]]))
+            shops = tour.shops
+            value = self._purchase_value(shops[:position] + [shop] + shops[position:])
+            if value - purchase_value + self._value(tour.delta_insert(position, shop)) < -1e-9:
+                tour.insert(position, shop)
+                visited.add(shop)
+                purchase_value = value
+                improved = True
+            if self._out_of_time():
+                break
+        return improved
@@ -1,11 +1,17 @@
 from shop import Shop
 from item import Item
-from route import Route
+from catalog import Catalog, OfferView
+from route import Route, RouteTable
+import numpy as np
 import pandas as pd
-from constants import M
+from functools import cached_property
+from copy import copy
+from constants import M, PRODUCT_CHUNK_SIZE, WALKING_DECIMALS
+from metrics import Metrics, measure
+from columnar import read_npz
 
 class InputData:
-    def __init__(self, origin: tuple[float, float], shops: list[Shop], items: list[Item], routes: list[Route]) -> None:
+    def __init__(self, origin: tuple[float, float], shops: list[Shop], items: list[Item], routes: list[Route] | RouteTable, forced_shops: set[str] = None, catalog: Catalog = None) -> None:
         """
         origin: (float, float)
             Start- and end location of user.
@@ -13,30 +19,52 @@ class InputData:
             List of shops from which items can be purchased.
         items: list[Item]
             List of items to be purchased; the shopping list.
+        routes: list[Route] | RouteTable
+            List of routes between shops; stored as a RouteTable over the shops.
+            Walking routes are implicit: every pair of shops has a costless route 0 whose time is
+            the distance between the shops. Given routes without cost and with the walking time
+            are left out of the table.
+        forced_shops: set[str]
+            Names of shops that must be visited in any schedule (see Presolver).
+        catalog: Catalog
+            Index of the offers of the shops; built from the shops if not given.
         """
         self.origin = origin
         self.shops = shops
         self.items = items # shopping list
-        self.routes = routes
-        self.route_by_number = self.route_matrix(eq_num_routes=False)
+        routes = routes if isinstance(routes, RouteTable) else RouteTable.from_routes(routes, [shop.name for shop in shops])
+        self.routes = routes.select(~self._is_walking(routes))
+        self.forced_shops = forced_shops if forced_shops is not None else set()
+        self.catalog = catalog if catalog is not None else Catalog.from_shops(shops)
+
+        # lookup index: shop name -> index (routes are looked up by shop index in the route table)
+        self.shop_by_name = {shop.name: k for k, shop in enumerate(shops)}
+        self._max_routes = 1 + self.routes.max_routes() # walking route and explicit routes
+        self.travel_table = None # see with_travel_table
 
     def _get_origin(path: str) -> tuple[float, float]:
         return (50, 50)
     
-    def _get_shops(path: str, origin: tuple[float, float]) -> list[Shop]:
+    def _get_shops(path: str, origin: tuple[float, float], products: set[str] = None) -> list[Shop]:
         shop_data = pd.read_csv(path + 'shop_data.csv', header=None, index_col=False)
         shop_list = [Shop(name, (loc_x, loc_y), {}, {}) for name, loc_x, loc_y in shop_data.to_numpy()]
         shops = dict([(shop.name, shop) for shop in shop_list])
 
         shops["origin"].location = origin # update origin location
 
-        product_data = pd.read_csv(path + 'product_data.csv', header=None, index_col=False)
-        for (shop_name, product_name, price, stock) in product_data.to_numpy():
-            if shop_name in shops.keys():
-                shops[shop_name].price_by_product[product_name] = price
-                shops[shop_name].stock_by_product[product_name] = stock
-            else:
-                raise Exception("Encountered unknown shop name")
+        if products is None:
+            chunks = [pd.read_csv(path + 'product_data.csv', header=None, index_col=False)]
+        else: # stream the offers, keeping only those of the given products
+            chunks = pd.read_csv(path + 'product_data.csv', header=None, index_col=False, chunksize=PRODUCT_CHUNK_SIZE)
+        for chunk in chunks:
+            if products is not None:
+                chunk = chunk[chunk[1].isin(products)]
+            for (shop_name, product_name, price, stock) in chunk.to_numpy():
+                if shop_name in shops.keys():
+                    shops[shop_name].price_by_product[product_name] = price
+                    shops[shop_name].stock_by_product[product_name] = stock
+                else:
+                    raise Exception("Encountered unknown shop name")
         return list(shops.values())
     
     def _get_items(path: str) -> list[Item]:
@@ -44,123 +72,275 @@ class InputData:
         items = [Item(name, quantity) for (name, quantity) in item_data.values]
         return items
 
-    def _get_routes(path: str) -> list[Route]:
-        route_data = pd.read_csv(path + 'route_data.csv', header=None, index_col=False)
-        routes = [Route(shop_from, shop_to, time, cost) for (shop_from, shop_to, time, cost) in route_data.values]
-        return routes
+    def _get_routes(path: str, shop_names: list[str]) -> RouteTable:
+        try:
+            route_data = pd.read_csv(path + 'route_data.csv', header=None, index_col=False)
+        except pd.errors.EmptyDataError: # only walking routes
+            route_data = pd.DataFrame(columns=range(4))
+        shop_index = pd.Index(shop_names)
+        route_from = shop_index.get_indexer(route_data[0])
+        route_to = shop_index.get_indexer(route_data[1])
+        if (route_from < 0).any() or (route_to < 0).any():
+            raise Exception("Encountered unknown shop name")
+        return RouteTable(shop_names, route_from, route_to, route_data[2].to_numpy(dtype=float), route_data[3].to_numpy(dtype=float))
+
+    def _view_offers(shops: list[Shop], catalog: Catalog) -> None:
+        # shops read their prices and stock through views of the catalog instead of holding dicts
+        for j, shop in enumerate(shops):
+            shop.price_by_product = OfferView(catalog, j, catalog.prices)
+            shop.stock_by_product = OfferView(catalog, j, catalog.stocks)
+
+    @classmethod
+    def from_csv(cls, path: str, metrics: Metrics = None, watch: set[str] = None):
+        """
+        Reads input data from the csv files in path.
+        -----
+        watch: set[str]
+            If given, the product file is read in chunks and only offers of products on the
+            shopping list or in watch are kept, so that memory use is bounded by the size of the
+            list rather than of the product file. Use an empty set to keep only the shopping list.
+        """
+        with measure(metrics, "load"):
+            origin = cls._get_origin(path)
+            items = cls._get_items(path)
+            products = None if watch is None else {item.name for item in items} | set(watch)
+            shops = cls._get_shops(path, origin, products)
+            catalog = Catalog.from_shops(shops)
+            cls._view_offers(shops, catalog)
+            routes = cls._get_routes(path, [shop.name for shop in shops])
+            return InputData(origin, shops, items, routes, catalog=catalog)
 
     @classmethod
-    def from_csv(cls, path: str):
-        origin = cls._get_origin(path)
-        shops = cls._get_shops(path, origin)
-        items = cls._get_items(path)
-        routes = cls._get_routes(path)
-        return InputData(origin, shops, items, routes)
+    def from_npz(cls, file: str, metrics: Metrics = None, watch: set[str] = None):
+        """
+        Reads input data from a .npz file written by write_npz (see columnar.py).
+        Offers are loaded into the catalog arrays directly; shops read their prices
+        and stock through views of the catalog.
+        If watch is given, the catalog only holds the products on the shopping list or in watch.
+        """
+        with measure(metrics, "load"):
+            columns = read_npz(file)
+            origin = cls._get_origin(file)
+            shop_names = columns["shop_names"].tolist()
+            product_names = columns["product_names"].tolist()
+            offer_product, item_product = columns["offer_product"], columns["item_product"]
+            keep = np.ones(len(offer_product), dtype=bool)
+            if watch is not None:
+                products = {product_names[p] for p in item_product.tolist()} | set(watch)
+                kept_ids = np.array([p for p, name in enumerate(product_names) if name in products], dtype=int)
+                new_ids = np.full(len(product_names), -1)
+                new_ids[kept_ids] = np.arange(len(kept_ids))
+                product_names = [product_names[p] for p in kept_ids]
+                keep = new_ids[offer_product] >= 0
+                offer_product, item_product = new_ids[offer_product[keep]], new_ids[item_product]
+            catalog = Catalog.from_offers(shop_names, product_names, columns["offer_shop"][keep], offer_product,
+                                          columns["offer_price"][keep], columns["offer_stock"][keep])
+
+            locations = zip(columns["shop_x"].tolist(), columns["shop_y"].tolist())
+            shops = [Shop(name, location, {}, {}) for name, location in zip(shop_names, locations)]
+            cls._view_offers(shops, catalog)
+            shops[catalog.shop_ids["origin"]].location = origin # update origin location
+
+            items = [Item(product_names[p], quantity) for p, quantity in
+                     zip(item_product.tolist(), columns["item_quantity"].tolist())]
+            routes = RouteTable(shop_names, columns["route_from"], columns["route_to"], columns["route_time"], columns["route_cost"])
+            return InputData(origin, shops, items, routes, catalog=catalog)
     
+    def with_items(self, items: list[Item]):
+        """
+        Returns input data for another shopping list.
+        Shops, routes and their indexes and matrices are shared, not recomputed.
+        """
+        data = copy(self)
+        data.items = items
+        data.forced_shops = set()
+        for name in ("price_matrix", "stock_matrix", "offer_matrix"): # item dependent
+            data.__dict__.pop(name, None)
+        return data
+
+    def with_travel_table(self, table):
+        """
+        Returns input data whose arcs are the options of a travel table (see travel.TravelTable)
+        instead of the routes: travel between two shops may then pass through other shops.
+        Route arrays and arcs are indexed by option; arc_routes() returns the routes of an option.
+        """
+        data = copy(self)
+        data.travel_table = table
+        data.route_time_array = np.where(np.isfinite(table.time), table.time, M)
+        data.route_cost_array = np.where(np.isfinite(table.cost), table.cost, M)
+        data.route_arcs = table.arcs()
+        data.__dict__.pop("arcs_by_pair", None) # indexes the arcs of the routes
+        data._max_routes = table.time.shape[2]
+        return data
+
     def unavailable_items(self) -> list[str]:
         """
         Returns names of items not available in any shops.
         """
-        items = []
-        for item in self.items:
-            available_in = [item.name in shop.available_products() for shop in self.shops]
-            if not any(available_in):
-                items.append(item)
-        return items
+        return [item for item in self.items if not self.catalog.offers(item.name)]
 
-    def shop_distances(self) -> dict[(str, str), float]:
+    @cached_property
+    def price_matrix(self) -> np.ndarray:
         """
-        Returns dictionary of distances between shops: (from, to).
+        Returns array of product prices: (item, shop), or M if not offered.
         """
-        distances = {}
-        for shop1 in self.shops:
-            for shop2 in self.shops:
-                if (shop1.name, shop2.name) not in distances:
-                    distances[(shop1.name, shop2.name)] = round(shop1.euclidian_distance(shop2), 4)
-                    distances[(shop2.name, shop1.name)] = distances[(shop1.name, shop2.name)]
-        return distances
-    
-    def route_matrix(self,eq_num_routes: bool) -> dict[(str,str), list[Route]]:
-        """
-        Returns dictionary of routes: (shop_from, shop_to, route)
-        If eq_num_routes is true, all pairs of shops will have an equal number of routes between them.
-        """
-        # add real routes to result dictionary
-        routes = {}
-        for route in self.routes:
-            if (route.shop_from, route.shop_to) in routes:
-                routes[(route.shop_from, route.shop_to)].append(route)
-            else:
-                routes[(route.shop_from, route.shop_to)] = [route]
-
-        # give all pairs an equal number of routes by adding dummies
-        if eq_num_routes:
-            max_routes = self.max_routes() # or max([len(x) for x in routes.values()])
-            dummy_route = Route("", "", M, M)
-            for (shop_from, shop_to) in routes.keys():
-                num_routes = len(routes[(shop_from, shop_to)])
-                num_add = max_routes - num_routes
-                for _ in range(num_add):
-                    routes[(shop_from, shop_to)].append(dummy_route)
-        return routes
-    
-    def route_times(self, eq_num_routes: bool) -> dict[(str,str), list[float]]:
+        prices = np.full((len(self.items), len(self.shops)), M, dtype=float)
+        for i, item in enumerate(self.items):
+            if item.name in self.catalog.product_ids:
+                item_prices = self.catalog.prices[:, self.catalog.product_ids[item.name]]
+                prices[i] = np.where(np.isnan(item_prices), M, item_prices)
+        return prices
+
+    @cached_property
+    def stock_matrix(self) -> np.ndarray:
+        """
+        Returns array of product stock: (item, shop), or 0 if not offered.
+        """
+        stock = np.zeros((len(self.items), len(self.shops)), dtype=int)
+        for i, item in enumerate(self.items):
+            if item.name in self.catalog.product_ids:
+                stock[i] = self.catalog.stocks[:, self.catalog.product_ids[item.name]]
+        return stock
+
+    @cached_property
+    def offer_matrix(self) -> np.ndarray:
+        """
+        Returns boolean array: (item, shop), True if the item is offered at the shop.
         """
-        Returns dictionary of route times: (from, to, route_num)
-        If eq_num_routes is true, all pairs of shops will have an equal number of routes between them.
+        return self.price_matrix < M
+
+    @cached_property
+    def distance_matrix(self) -> np.ndarray:
+        """
+        Returns array of euclidian distances between shops: (from, to).
+        """
+        return np.round(self._distances(np.arange(len(self.shops))[:, np.newaxis], np.arange(len(self.shops))), 4)
+
+    @cached_property
+    def walking_time_matrix(self) -> np.ndarray:
+        """
+        Returns array of walking times between shops: (from, to).
+        """
+        return self.walking_times(np.arange(len(self.shops))[:, np.newaxis], np.arange(len(self.shops)))
+
+    def walking_times(self, shop_from: np.ndarray, shop_to: np.ndarray) -> np.ndarray:
+        """
+        Returns walking times between shops given by index, broadcast like NumPy arrays.
+        """
+        return np.round(self._distances(shop_from, shop_to), WALKING_DECIMALS)
+
+    def _distances(self, shop_from: np.ndarray, shop_to: np.ndarray) -> np.ndarray:
+        locations = self._locations
+        delta = locations[shop_from] - locations[shop_to]
+        return np.hypot(delta[..., 0], delta[..., 1])
+
+    @cached_property
+    def _locations(self) -> np.ndarray:
+        return np.array([shop.location for shop in self.shops], dtype=float).reshape(-1, 2)
+
+    def _is_walking(self, routes: RouteTable) -> np.ndarray:
+        # given routes that are implicit walking routes
+        walking = self.walking_times(routes.shop_from, routes.shop_to)
+        return (routes.cost == 0) & np.isclose(routes.time, walking, rtol=0, atol=10 ** -WALKING_DECIMALS)
+
+    @cached_property
+    def route_time_array(self) -> np.ndarray:
+        """
+        Returns array of route times: (from, to, route_num).
+        All pairs of shops have max_routes() routes; missing routes take time M.
+        """
+        return self._route_array(self.routes.time, self.walking_time_matrix)
+
+    @cached_property
+    def route_cost_array(self) -> np.ndarray:
+        """
+        Returns array of route costs: (from, to, route_num).
+        All pairs of shops have max_routes() routes; missing routes cost M.
+        """
+        return self._route_array(self.routes.cost, 0)
+
+    @cached_property
+    def route_arcs(self) -> list[tuple[int, int, int]]:
+        """
+        Returns list of arcs (from, to, route_num) for which a route exists.
+        Self-loops and dominated routes (slower and more expensive than
+        another route between the same shops) are left out.
         """
-        route_matrix = self.route_matrix(eq_num_routes)
-        times = {key:[r.time for r in routes] for key,routes in route_matrix.items()}
-        return times
+        times, costs = self.route_time_array, self.route_cost_array
+        exists = times < M
+        dominated = np.zeros_like(exists)
+        for r in range(self.max_routes()):
+            for o in range(self.max_routes()):
+                # identical routes are only kept once (the first)
+                identical = (times[..., o] == times[..., r]) & (costs[..., o] == costs[..., r])
+                dominates = np.where(identical, o < r, (times[..., o] <= times[..., r]) & (costs[..., o] <= costs[..., r]))
+                dominated[..., r] |= exists[..., o] & dominates
+        shops = np.arange(len(self.shops))
+        exists[shops, shops] = False # self-loops
+        k, j, r = np.nonzero(exists & ~dominated)
+        return list(zip(k.tolist(), j.tolist(), r.tolist()))
 
-    def route_costs(self, eq_num_routes: bool) -> dict[(str,str), list[float]]:
+    @cached_property
+    def arcs_by_pair(self) -> dict[tuple[int, int], list[int]]:
         """
-        Returns dictionary of route costs: (from, to, route_num)
-        If eq_num_routes is true, all pairs of shops will have an equal number of routes between them.
+        Returns dictionary of the route numbers of route_arcs by pair of shops: (from, to) -> [route_num].
         """
-        route_matrix = self.route_matrix(eq_num_routes)
-        costs = {key:[r.cost for r in routes] for key,routes in route_matrix.items()}
-        return costs
+        arcs = dict()
+        for (k, j, r) in self.route_arcs:
+            arcs.setdefault((k, j), []).append(r)
+        return arcs
+
+    def _route_array(self, column: np.ndarray, walking: np.ndarray) -> np.ndarray:
+        num_shops = len(self.shops)
+        values = np.full((num_shops, num_shops, self.max_routes()), M, dtype=float)
+        values[:, :, 0] = walking
+        values[self.routes.shop_from, self.routes.shop_to, self.routes.route_num + 1] = column
+        return values
 
     def max_routes(self) -> int:
         """
         Returns the maximum number of routes across any ordered pair of shops.
         """
-        num_routes = dict()
-        for route in self.routes:
-            if (route.shop_from, route.shop_to) in num_routes:
-                num_routes[route.shop_from, route.shop_to] += 1
-            else:
-                num_routes[route.shop_from, route.shop_to] = 1
-        return max(num_routes.values()) 
+        return self._max_routes
 
     def get_walking_route(self, shop_from: str, shop_to: str) -> Route:
         """
-        Returns the route from shop_from to shop_to by walking.
-        This route should always exist in the input data.
+        Returns the route from shop_from to shop_to by walking, computed from the shop locations.
+        This route exists between any two shops.
         """
-        for route in self.routes:
-            if route.shop_from == shop_from and route.shop_to == shop_to and route.cost == 0:
-                return route
+        if shop_from in self.shop_by_name and shop_to in self.shop_by_name:
+            time = self.walking_times(self.shop_by_name[shop_from], self.shop_by_name[shop_to])
+            return Route(shop_from, shop_to, time.item(), 0)
         raise LookupError(f"Could not find walking route from {shop_from} to {shop_to}.")
     
     def get_route(self, shop_from: str, shop_to: str, route_num:int) -> Route:
         """
         Returns the route_num'th route from shop_from to shop_to, or
-        None of this route does not exist.             
+        None of this route does not exist. Route 0 is the walking route.
         """
-        if (shop_from, shop_to) in self.route_by_number:
-            if len(self.route_by_number[(shop_from, shop_to)]) > route_num:
-                return self.route_by_number[(shop_from, shop_to)][route_num]
+        if shop_from in self.shop_by_name and shop_to in self.shop_by_name:
+            if route_num == 0:
+                return self.get_walking_route(shop_from, shop_to)
+            routes = self.routes.pair(self.shop_by_name[shop_from], self.shop_by_name[shop_to])
+            if len(routes) >= route_num:
+                return self.routes[routes[route_num - 1]]
         return None
     
+    def arc_routes(self, shop_from: int, shop_to: int, route_num: int) -> list[Route]:
+        """
+        Returns the routes taken by a travel arc (from, to, route_num) of route_arcs, in order.
+        This is the single route route_num, unless the arcs come from a travel table.
+        """
+        if self.travel_table is not None:
+            return self.travel_table.routes(self, shop_from, shop_to, route_num)
+        return [self.get_route(self.shops[shop_from].name, self.shops[shop_to].name, route_num)]
+
     def get_shop_index(self, shop_name:str) -> int:
         """
         Returns the index of a given shop, or -1 if not found.
         """
-        for i in range(len(self.shops)):
-            if self.shops[i].name == shop_name:
-                return i
+        if shop_name in self.shop_by_name:
+            return self.shop_by_name[shop_name]
         raise LookupError(f"{shop_name} is not in shop list.")
 
     def __repr__(self) -> str:
@@ -1,5 +1,7 @@
 
 class Item:
+    __slots__ = ("name", "quantity")
+
     def __init__(self, name: str, quantity: int) -> None:
         self.name = name
         self.quantity = quantity # desired quantity
@@ -1,7 +1,8 @@
 from input_data import InputData
 from data_generator import DataGenerator
-from schedulers import BasicScheduler, Model1Scheduler, BestPriceScheduler, Model2Scheduler, Model3Scheduler
+from schedulers import BasicScheduler, Model1Scheduler, BestPriceScheduler, Model2Scheduler, Model3Scheduler, HeuristicScheduler
 from validators import ScheduleValidator
+from presolve import Presolver
 
 if __name__ == '__main__':
     # Generate input data
@@ -11,6 +12,14 @@ if __name__ == '__main__':
     # Read input data
     input_data = InputData.from_csv('input/')
 
+    # Reduce input data for the models
+    presolver = Presolver(input_data, quantities=False)
+    presolved_data = presolver.presolve()
+    print(presolver.report)
+    quantity_presolver = Presolver(input_data)
+    quantity_presolved_data = quantity_presolver.presolve()
+    print(quantity_presolver.report)
+
     # Run schedulers
     basic_schedule = BasicScheduler(input_data).schedule()
     print(basic_schedule)
@@ -24,21 +33,26 @@ if __name__ == '__main__':
     print(f"Distance: {round(cheap_schedule.duration, 2)}")
     ScheduleValidator(input_data, cheap_schedule).validate()
 
-    model1_schedule = Model1Scheduler(input_data).schedule(kpi_cost=7,kpi_distance=1)
+    model1_schedule = Model1Scheduler(presolved_data).schedule(kpi_cost=7,kpi_distance=1)
     print(model1_schedule)
     print(f"Cost: {round(model1_schedule.cost, 2)}")
     print(f"Distance: {round(model1_schedule.duration, 2)}")
     ScheduleValidator(input_data, model1_schedule).validate()
 
-    model2_schedule = Model2Scheduler(input_data).schedule(kpi_cost=7,kpi_distance=1)
+    model2_schedule = Model2Scheduler(presolved_data).schedule(kpi_cost=7,kpi_distance=1)
     print(model2_schedule)
     print(f"Cost: {round(model2_schedule.cost, 2)}")
     print(f"Distance: {round(model2_schedule.duration, 2)}")
     ScheduleValidator(input_data, model2_schedule).validate()
 
-    model3_schedule = Model3Scheduler(input_data).schedule(kpi_cost=7,kpi_distance=1)
+    model3_schedule = Model3Scheduler(quantity_presolved_data).schedule(kpi_cost=7,kpi_distance=1)
     print(model3_schedule)
     print(f"Cost: {round(model3_schedule.cost, 2)}")
     print(f"Distance: {round(model3_schedule.duration, 2)}")
     ScheduleValidator(input_data, model3_schedule).validate()
-    
\ No newline at end of file
+
+    heuristic_schedule = HeuristicScheduler(quantity_presolved_data).schedule(kpi_cost=7,kpi_distance=1,time_limit=0.1)
+    print(heuristic_schedule)
+    print(f"Cost: {round(heuristic_schedule.cost, 2)}")
+    print(f"Distance: {round(heuristic_schedule.duration, 2)}")
+    ScheduleValidator(input_data, heuristic_schedule).validate()
@@ -0,0 +1,88 @@
+import cProfile
+import pstats
+import tracemalloc
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+
+class MetricsSink(ABC):
+    """
+    Receives every timing and count recorded by Metrics.
+    """
+    @abstractmethod
+    def record(self, name: str, value: float) -> None:
+        pass
+
+class PrintSink(MetricsSink):
+    def record(self, name: str, value: float) -> None:
+        print(f"{name:30s} : {value}")
+
+class Metrics:
+    def __init__(self, profile: set[str] = (), trace_memory: set[str] = (), sinks: list[MetricsSink] = ()) -> None:
+        """
+        Collects the time spent in each phase (load, build, solve, decode, validate) and counts
+        such as the number of model variables and constraints.
+        -----
+        profile: set[str]
+            Phases run under cProfile; their statistics are kept in profiles.
+        trace_memory: set[str]
+            Phases run under tracemalloc; their peak memory use (bytes) is kept in memory_peaks.
+        sinks: list[MetricsSink]
+            Sinks receiving each timing and count when recorded.
+        """
+        self._profile = set(profile)
+        self._trace_memory = set(trace_memory)
+        self._sinks = list(sinks)
+        self.timings = dict() # phase -> seconds, summed over repeated phases
+        self.counts = dict()
+        self.profiles = dict() # phase -> pstats.Stats
+        self.memory_peaks = dict()
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Context manager timing (and optionally profiling) a phase.
+        """
+        profiler = cProfile.Profile() if name in self._profile else None
+        trace = name in self._trace_memory
+        started_tracing = trace and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if trace:
+            tracemalloc.reset_peak()
+        if profiler is not None:
+            profiler.enable()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                self.profiles[name] = pstats.Stats(profiler)
+            if trace:
+                self.memory_peaks[name] = tracemalloc.get_traced_memory()[1]
+                self._emit(f"{name}_peak_memory", self.memory_peaks[name])
+            if started_tracing:
+                tracemalloc.stop()
+            self.timings[name] = self.timings.get(name, 0) + seconds
+            self._emit(f"{name}_time", seconds)
+
+    def count(self, name: str, value: int) -> None:
+        self.counts[name] = value
+        self._emit(name, value)
+
+    def _emit(self, name: str, value: float) -> None:
+        for sink in self._sinks:
+            sink.record(name, value)
+
+    def __repr__(self) -> str:
+        timings = ", ".join(f"{name} {round(seconds, 4)}s" for name, seconds in self.timings.items())
+        counts = ", ".join(f"{name} {value}" for name, value in self.counts.items())
+        return f"{timings}; {counts}" if counts else timings
+
+def measure(metrics: Metrics, name: str):
+    """
+    Returns a context manager timing the phase in metrics, or doing nothing if metrics is None.
+    """
+    return metrics.phase(name) if metrics is not None else nullcontext()
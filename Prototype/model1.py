@@ -1,7 +1,8 @@
 from docplex.mp.model import Model
 from constants import M
+from subtours import add_subtour_callback
 
-def model1(input_data, kpi_cost, kpi_distance):
+def model1(input_data, kpi_cost, kpi_distance, tour_constraints="mtz"):
      """
      DOcplex model for scheduling shopping tour.
      -----
@@ -9,10 +10,13 @@ def model1(input_data, kpi_cost, kpi_distance):
      Does not include item quantities.
      Distance between shops is fixed.
      Shops are always open.
+     Tours are enforced by MTZ ordering constraints ("mtz") or by lazy subtour elimination ("lazy").
      """
+     if tour_constraints not in ("mtz", "lazy"):
+          raise ValueError(f"Unknown tour constraints: {tour_constraints}")
+
      shops = input_data.shops
      items = input_data.items
-     shop_dist = input_data.shop_distances()
 
      model1 = Model(name = "model1")
 
@@ -32,29 +36,34 @@ def model1(input_data, kpi_cost, kpi_distance):
      e = model1.binary_var_matrix(num_shops, num_shops, name = "e")
 
      # shop visit order
-     u = model1.integer_var_list(keys=s_labels, ub = num_shops - 1, name = "u")
+     if tour_constraints == "mtz":
+          u = model1.integer_var_list(keys=s_labels, ub = num_shops - 1, name = "u")
 
      # product prices: p_ij is the price of product i at shop j, or M if not valid
-     p = [[(s.price_by_product[i.name] if i.name in s.available_products() else M) 
-          for s in shops] 
-          for i in items]
+     p = input_data.price_matrix
         
      # distances: d_kj is the distance from shop k to shop j
-     d = [[shop_dist[(k.name, j.name)] for k in shops] for j in shops]
+     d = input_data.distance_matrix
 
      # objective function: minimize cost
-     obj_func = sum( kpi_cost * sum(p[i][j] * x[i,j] for i in i_labels) + kpi_distance * sum(d[k][j] * e[k,j] for k in s_labels) for j in s_labels)
-     model1.set_objective(sense = 'min', expr = obj_func)
+     x_vars = [x[i,j] for i in i_labels for j in s_labels]
+     e_vars = [e[k,j] for k in s_labels for j in s_labels]
+     obj_cost = model1.scal_prod(x_vars, p.ravel())
+     obj_time = model1.scal_prod(e_vars, d.ravel())
+     model1.set_objective(sense = 'min', expr = kpi_cost * obj_cost + kpi_distance * obj_time)
         
      # every item is purchased
      model1.add_constraints((sum(x[i,j] for j in s_labels) >= 1 for i in i_labels))
 
      # no purchase costs M or more (only valid purchases)
-     model1.add_constraints(sum(x[i,j] * p[i][j] for j in s_labels) <= M - 1 for i in i_labels)
+     model1.add_constraints(model1.scal_prod([x[i,j] for j in s_labels], p[i]) <= M - 1 for i in i_labels)
 
      # each used shop is visited
      model1.add_constraints((sum(x[i,j] for i in i_labels) <= 1000 * s[j] for j in s_labels))
 
+     # forced shops are visited
+     model1.add_constraints(s[input_data.get_shop_index(name)] == 1 for name in input_data.forced_shops)
+
      # each visited shop is traveled to
      model1.add_constraints(sum(e[k,j] for k in s_labels if k != j) >= s[j] for j in s_labels)
 
@@ -62,7 +71,19 @@ def model1(input_data, kpi_cost, kpi_distance):
      model1.add_constraints(sum(e[k,j] for j in s_labels if j != k) <= s[k] for k in s_labels)
 
      # enforce proper tour
-     model1.add_constraints(u[k] - u[j] + 1 <= (num_shops - 2) * (1 - e[k,j]) for k in s_labels  if k > 0 for j in s_labels)
+     if tour_constraints == "mtz":
+          model1.add_constraints(u[k] - u[j] + 1 <= num_shops * (1 - e[k,j]) for k in s_labels  if k > 0 for j in s_labels)
+     else:
+          model1.add_constraints(e[k,k] == 0 for k in s_labels)
+          add_subtour_callback(model1, {(k, j): [e[k,j]] for k in s_labels for j in s_labels if k != j}, s)
+
+     # variables kept for decoding: purchases (item, shop) and travel arcs (from, to, route)
+     model1.purchase_vars = [[x[i,j] for j in s_labels] for i in i_labels]
+     model1.travel_arcs = [(k, j, 0) for k in s_labels for j in s_labels if k != j]
+     model1.travel_vars = [e[k,j] for (k, j, _) in model1.travel_arcs]
+
+     # objective terms kept for re-weighting (see ModelScheduler.pareto_front)
+     model1.objective_terms = (obj_cost, obj_time)
 
      return model1
         
\ No newline at end of file
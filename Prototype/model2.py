@@ -1,29 +1,37 @@
+import numpy as np
 from docplex.mp.model import Model
 from route import Route
 from constants import M
+from subtours import add_subtour_callback
 
-def model2(input_data, kpi_cost, kpi_distance):
+def model2(input_data, kpi_cost, kpi_distance, tour_constraints="mtz"):
      """
      DOcplex model for scheduling shopping tour.
      -----
      Requires all items to be purchasable at some shop.
      Does not include item quantities.
-     Different routes can be taken between two shops.
+     Different routes can be taken between two shops; only non-dominated routes are considered.
      Shops are always open.
+     Tours are enforced by MTZ ordering constraints ("mtz") or by lazy subtour elimination ("lazy").
      """
+     if tour_constraints not in ("mtz", "lazy"):
+          raise ValueError(f"Unknown tour constraints: {tour_constraints}")
+
      shops = input_data.shops
      items = input_data.items
-     route_times = input_data.route_times(eq_num_routes=True)
-     route_costs = input_data.route_costs(eq_num_routes=True)
 
      model2 = Model(name = "model2")
 
      num_shops = len(shops)
      num_items = len(items)
-     num_routes = input_data.max_routes()
+     arcs = input_data.route_arcs # (from, to, route) for existing, non-dominated routes
      s_labels = range(num_shops) # shop labels
      i_labels = range(num_items) # item labels
-     r_labels = range(num_routes) # route labels     
+     arcs_into = [[] for _ in s_labels]
+     arcs_out_of = [[] for _ in s_labels]
+     for (k, j, r) in arcs:
+          arcs_out_of[k].append((k, j, r))
+          arcs_into[j].append((k, j, r))
 
      # decision variable: x_ij = 1 if item i is purchased at shop j and 0 otherwise
      x = model2.binary_var_matrix(num_items, num_shops, name = "x")
@@ -32,42 +40,62 @@ def model2(input_data, kpi_cost, kpi_distance):
      s = model2.binary_var_list(num_shops, name = "s")
 
      # binary variable: e_jkr = 1 if shop k is visited directly after shop j using route r and 0 otherwise
-     e = model2.binary_var_cube(num_shops, num_shops, num_routes, name = "e")
+     e = model2.binary_var_dict(arcs, name = "e")
 
      # shop visit order
-     u = model2.integer_var_list(keys=s_labels, ub = num_shops - 1, name = "u")
+     if tour_constraints == "mtz":
+          u = model2.integer_var_list(keys=s_labels, ub = num_shops - 1, name = "u")
 
      # product prices: p_ij is the price of product i at shop j, or M if not valid
-     p = [[(s.price_by_product[i.name] if i.name in s.available_products() else M) 
-          for s in shops] 
-          for i in items]
+     p = input_data.price_matrix
      
-     # route duration: d_kjr is the time from shop k to shop j using route r
-     d = [[[route_times[(k.name, j.name)][r] for r in r_labels] for j in shops] for k in shops]
+     # route duration: d_kjr is the time from shop k to shop j using route r (M if no such route)
+     d = input_data.route_time_array
 
      # route cost: c_kjr is the cost of traveling from shop k to shop j using route r
-     c = [[[route_costs[(k.name, j.name)][r] for r in r_labels] for j in shops] for k in shops]
+     c = input_data.route_cost_array
 
      # objective function: minimize cost
-     obj_func = sum( kpi_cost * sum(p[i][j] * x[i,j] for i in i_labels) + sum((kpi_distance * d[k][j][r] + kpi_cost * c[k][j][r]) * e[k,j,r] for r in r_labels for k in s_labels) for j in s_labels)
-     model2.set_objective(sense = 'min', expr = obj_func)
+     x_vars = [x[i,j] for i in i_labels for j in s_labels]
+     e_vars = [e[arc] for arc in arcs]
+     arc_index = tuple(np.array(arcs, dtype=int).reshape(-1, 3).T)
+     obj_cost = model2.scal_prod(x_vars, p.ravel()) + model2.scal_prod(e_vars, c[arc_index])
+     obj_time = model2.scal_prod(e_vars, d[arc_index])
+     model2.set_objective(sense = 'min', expr = kpi_cost * obj_cost + kpi_distance * obj_time)
         
      # every item is purchased
      model2.add_constraints((sum(x[i,j] for j in s_labels) >= 1 for i in i_labels))
 
      # no purchase costs M or more (only valid purchases)
-     model2.add_constraints(sum(x[i,j] * p[i][j] for j in s_labels) <= M - 1 for i in i_labels)
+     model2.add_constraints(model2.scal_prod([x[i,j] for j in s_labels], p[i]) <= M - 1 for i in i_labels)
 
      # each used shop is visited
      model2.add_constraints((sum(x[i,j] for i in i_labels) <= 1000 * s[j] for j in s_labels))
 
+     # forced shops are visited
+     model2.add_constraints(s[input_data.get_shop_index(name)] == 1 for name in input_data.forced_shops)
+
      # each visited shop is traveled to
-     model2.add_constraints(sum(e[k,j,r] for r in r_labels for k in s_labels if k != j) >= s[j] for j in s_labels)
+     model2.add_constraints(sum(e[arc] for arc in arcs_into[j]) >= s[j] for j in s_labels)
 
      # each traveled from shop is visited
-     model2.add_constraints(sum(e[k,j,r] for r in r_labels for j in s_labels if j != k) <= s[k] for k in s_labels)
+     model2.add_constraints(sum(e[arc] for arc in arcs_out_of[k]) <= s[k] for k in s_labels)
 
      # enforce proper tour
-     model2.add_constraints(u[k] - u[j] + 1 <= (num_shops - 2) * (1 - e[k,j,r]) for r in r_labels for k in s_labels if k > 0 for j in s_labels)
+     if tour_constraints == "mtz":
+          model2.add_constraints(u[k] - u[j] + 1 <= num_shops * (1 - e[k,j,r]) for (k, j, r) in arcs if k > 0)
+     else:
+          arcs_by_pair = dict()
+          for (k, j, r) in arcs:
+               arcs_by_pair.setdefault((k, j), []).append(e[k,j,r])
+          add_subtour_callback(model2, arcs_by_pair, s)
+
+     # variables kept for decoding: purchases (item, shop) and travel arcs (from, to, route)
+     model2.purchase_vars = [[x[i,j] for j in s_labels] for i in i_labels]
+     model2.travel_arcs = arcs
+     model2.travel_vars = e_vars
+
+     # objective terms kept for re-weighting (see ModelScheduler.pareto_front)
+     model2.objective_terms = (obj_cost, obj_time)
 
      return model2
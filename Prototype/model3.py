@@ -1,83 +1,123 @@
+import numpy as np
 from docplex.mp.model import Model
 from constants import M
+from subtours import add_subtour_callback
 
-def model3(input_data, kpi_cost, kpi_distance):
+def model3(input_data, kpi_cost, kpi_distance, tour_constraints="mtz"):
      """
      DOcplex model for scheduling shopping tour.
      -----
      Requires all items to be purchasable at some shop.
-     Different routes can be taken between two shops.
+     Different routes can be taken between two shops; only non-dominated routes are considered.
      Shop product stock is taken into account.
      Shops are always open.
+     Tours are enforced by MTZ ordering constraints ("mtz") or by lazy subtour elimination ("lazy").
      """
-     shops = input_data.shops
-     items = input_data.items
-     route_times = input_data.route_times(eq_num_routes=True)
-     route_costs = input_data.route_costs(eq_num_routes=True)
+     model3, s, obj_travel_cost, obj_travel_time = model3_tour(input_data, tour_constraints)
 
-     model3 = Model(name = "model3")
-
-     num_shops = len(shops)
-     num_items = len(items)
-     num_routes = input_data.max_routes()
+     num_shops = len(input_data.shops)
+     num_items = len(input_data.items)
      s_labels = range(num_shops) # shop labels
      i_labels = range(num_items) # item labels
-     r_labels = range(num_routes) # route labels     
 
      # decision variable: x_ij is the amount of item i is purchased at shop j
-     x = model3.integer_var_matrix(num_items, num_shops, lb = 0, name = "x")
-
-     # binary variable: s_j = 1 if shop j is visited and 0 otherwise
-     s = model3.binary_var_list(num_shops, name = "s")
-
-     # decision variable: e_jkr = 1 if shop k is visited directly after shop j using route r and 0 otherwise
-     e = model3.binary_var_cube(num_shops, num_shops, num_routes, name = "e")
-
-     # shop visit order
-     u = model3.integer_var_list(keys=s_labels, ub = num_shops - 1, name = "u")
+     # (none for an empty shopping list, e.g. a tour through forced shops only)
+     x = model3.integer_var_matrix(num_items, num_shops, lb = 0, name = "x") if num_items else {}
 
      # product prices: p_ij is the price of product i at shop j, or M if not valid
-     p = [[(s.price_by_product[i.name] if i.name in s.available_products() else M) 
-          for s in shops] 
-          for i in items]
+     p = input_data.price_matrix
      
      # product stock: z_ij is the stock of product i at shop j, or 0 if not valid
-     z = [[(s.stock_by_product[i.name] if i.name in s.available_products() else 0) 
-          for s in shops] 
-          for i in items]
+     z = input_data.stock_matrix
      
      # item quantities: q_i is the amount of item i we would like to purchase
-     q = [item.quantity for item in items]
-     
-     # route duration: d_kjr is the time from shop k to shop j using route r
-     d = [[[route_times[(k.name, j.name)][r] for r in r_labels] for j in shops] for k in shops]
-
-     # route cost: c_kjr is the cost of traveling from shop k to shop j using route r
-     c = [[[route_costs[(k.name, j.name)][r] for r in r_labels] for j in shops] for k in shops]
+     q = [item.quantity for item in input_data.items]
 
      # objective function: minimize cost
-     obj_purchase_cost = sum(p[i][j]    * x[i,j]   for i in i_labels for j in s_labels)
-     obj_travel_cost   = sum(c[k][j][r] * e[k,j,r] for r in r_labels for k in s_labels for j in s_labels)
-     obj_travel_time   = sum(d[k][j][r] * e[k,j,r] for r in r_labels for k in s_labels for j in s_labels)
-     obj_func = kpi_cost * (obj_purchase_cost + obj_travel_cost) + kpi_distance * obj_travel_time
-     model3.set_objective(sense = 'min', expr = obj_func)
+     x_vars = [x[i,j] for i in i_labels for j in s_labels]
+     obj_purchase_cost = model3.scal_prod(x_vars, p.ravel())
+     obj_cost = obj_purchase_cost + obj_travel_cost
+     model3.set_objective(sense = 'min', expr = kpi_cost * obj_cost + kpi_distance * obj_travel_time)
         
      # every item is purchased
      model3.add_constraints(sum(x[i,j] for j in s_labels) >= q[i] for i in i_labels)
 
      # no purchase costs M or more (only valid purchases)
-     model3.add_constraints(sum(x[i,j] * p[i][j] for j in s_labels) <= M - 1 for i in i_labels)
+     model3.add_constraints(model3.scal_prod([x[i,j] for j in s_labels], p[i]) <= M - 1 for i in i_labels)
 
      # no purchase exceeds stock and only if shop is visited
-     model3.add_constraints(x[i,j] <= z[i][j] * s[j] for i in i_labels for j in s_labels)
+     model3.add_constraints(x[i,j] <= s[j] * z[i,j] for i in i_labels for j in s_labels)
+
+     # forced shops are visited
+     model3.add_constraints(s[input_data.get_shop_index(name)] == 1 for name in input_data.forced_shops)
+
+     # variables kept for decoding: purchases (item, shop)
+     model3.purchase_vars = [[x[i,j] for j in s_labels] for i in i_labels]
+
+     # objective terms kept for re-weighting (see ModelScheduler.pareto_front)
+     model3.objective_terms = (obj_cost, obj_travel_time)
+
+     return model3
+
+def model3_tour(input_data, tour_constraints="mtz"):
+     """
+     Tour part of model3, which does not depend on the shopping list.
+     -----
+     Returns the model, the shop visit variables s and the travel cost and travel time expressions.
+     """
+     if tour_constraints not in ("mtz", "lazy"):
+          raise ValueError(f"Unknown tour constraints: {tour_constraints}")
+
+     model3 = Model(name = "model3")
+
+     num_shops = len(input_data.shops)
+     arcs = input_data.route_arcs # (from, to, route) for existing, non-dominated routes
+     s_labels = range(num_shops) # shop labels
+     arcs_into = [[] for _ in s_labels]
+     arcs_out_of = [[] for _ in s_labels]
+     for (k, j, r) in arcs:
+          arcs_out_of[k].append((k, j, r))
+          arcs_into[j].append((k, j, r))
+
+     # binary variable: s_j = 1 if shop j is visited and 0 otherwise
+     s = model3.binary_var_list(num_shops, name = "s")
+
+     # decision variable: e_jkr = 1 if shop k is visited directly after shop j using route r and 0 otherwise
+     e = model3.binary_var_dict(arcs, name = "e")
+
+     # shop visit order
+     if tour_constraints == "mtz":
+          u = model3.integer_var_list(keys=s_labels, ub = num_shops - 1, name = "u")
+
+     # route duration: d_kjr is the time from shop k to shop j using route r (M if no such route)
+     d = input_data.route_time_array
+
+     # route cost: c_kjr is the cost of traveling from shop k to shop j using route r
+     c = input_data.route_cost_array
+
+     # travel part of the objective
+     e_vars = [e[arc] for arc in arcs]
+     arc_index = tuple(np.array(arcs, dtype=int).reshape(-1, 3).T)
+     obj_travel_cost = model3.scal_prod(e_vars, c[arc_index])
+     obj_travel_time = model3.scal_prod(e_vars, d[arc_index])
 
      # each visited shop is traveled to
-     model3.add_constraints(sum(e[k,j,r] for r in r_labels for k in s_labels if k != j) >= s[j] for j in s_labels)
+     model3.add_constraints(sum(e[arc] for arc in arcs_into[j]) >= s[j] for j in s_labels)
 
      # each traveled from shop is visited
-     model3.add_constraints(sum(e[k,j,r] for r in r_labels for j in s_labels if j != k) <= s[k] for k in s_labels)
+     model3.add_constraints(sum(e[arc] for arc in arcs_out_of[k]) <= s[k] for k in s_labels)
 
      # enforce proper tour
-     model3.add_constraints(u[k] - u[j] + 1 <= (num_shops - 2) * (1 - e[k,j,r]) for r in r_labels for k in s_labels if k > 0 for j in s_labels)
-
-     return model3
+     if tour_constraints == "mtz":
+          model3.add_constraints(u[k] - u[j] + 1 <= num_shops * (1 - e[k,j,r]) for (k, j, r) in arcs if k > 0)
+     else:
+          arcs_by_pair = dict()
+          for (k, j, r) in arcs:
+               arcs_by_pair.setdefault((k, j), []).append(e[k,j,r])
+          add_subtour_callback(model3, arcs_by_pair, s)
+
+     # variables kept for decoding: travel arcs (from, to, route)
+     model3.travel_arcs = arcs
+     model3.travel_vars = e_vars
+
+     return model3, s, obj_travel_cost, obj_travel_time
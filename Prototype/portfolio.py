@@ -0,0 +1,171 @@
+import inspect
+import multiprocessing
+from multiprocessing.connection import wait
+from time import perf_counter
+from input_data import InputData
+from schedule import Schedule
+from tour import Tour
+from heuristic import LocalSearch
+from schedulers import Scheduler, Model2Scheduler, Model3Scheduler, HeuristicScheduler, BestPriceTourScheduler
+from validators import ScheduleValidator
+from metrics import Metrics, measure
+
+class Strategy:
+    def __init__(self, name: str, scheduler_cls, scheduler_params: dict = None, schedule_params: dict = None,
+                 quantities: bool = True) -> None:
+        """
+        A scheduler configuration raced in a portfolio.
+        -----
+        scheduler_params: dict
+            Keyword arguments passed to the scheduler constructor, e.g. tour_constraints.
+        schedule_params: dict
+            Keyword arguments passed to schedule(), e.g. mip_gap. The objective weights and the time
+            limit are passed by the portfolio if schedule() accepts them and they are not given here.
+        quantities: bool
+            Whether the scheduler purchases item quantities. If not, the purchases of its schedules are
+            replaced by the cheapest purchases within stock on their tour when the portfolio requires quantities.
+        """
+        self.name = name
+        self.scheduler_cls = scheduler_cls
+        self.scheduler_params = scheduler_params or {}
+        self.schedule_params = schedule_params or {}
+        self.quantities = quantities
+
+    def __repr__(self) -> str:
+        return self.name
+
+STRATEGIES = [
+    Strategy("model3", Model3Scheduler),
+    Strategy("model3-lazy", Model3Scheduler, {"tour_constraints": "lazy"}),
+    Strategy("model2-relaxed", Model2Scheduler, schedule_params={"mip_gap": 0.05}, quantities=False),
+    Strategy("best-price-tour", BestPriceTourScheduler),
+    Strategy("heuristic", HeuristicScheduler)
+]
+
+SOLVER_SHARE = 0.8 # share of the deadline given to the solvers as time limit, so they can return their best solution
+
+class StrategyResult:
+    def __init__(self, name: str, schedule: Schedule, objective: float, seconds: float, error: str = None) -> None:
+        """
+        Result of one strategy in a portfolio.
+        schedule is None if the strategy failed or did not finish before the deadline, in which case
+        error describes why; objective is None if the schedule does not solve the problem.
+        """
+        self.name = name
+        self.schedule = schedule
+        self.objective = objective
+        self.seconds = seconds
+        self.error = error
+
+    def __repr__(self) -> str:
+        outcome = self.error if self.objective is None else f"objective {round(self.objective, 4)}"
+        return f"{self.name}: {outcome} in {round(self.seconds, 4)}s"
+
+def _run_strategy(input_data: InputData, strategy: Strategy, defaults: dict, connection) -> None:
+    start = perf_counter()
+    try:
+        scheduler = strategy.scheduler_cls(input_data, **strategy.scheduler_params)
+        accepted = inspect.signature(scheduler.schedule).parameters
+        params = {name: value for name, value in defaults.items() if name in accepted}
+        schedule = scheduler.schedule(**dict(params, **strategy.schedule_params))
+        connection.send((schedule.to_records(), perf_counter() - start, None))
+    except Exception as e:
+        connection.send((None, perf_counter() - start, f"{type(e).__name__}: {e}"))
+
+class PortfolioScheduler(Scheduler):
+    def __init__(self, input_data: InputData, strategies: list[Strategy] = STRATEGIES, quantities: bool = True,
+                 metrics: Metrics = None) -> None:
+        """
+        Races several scheduler configurations in parallel processes and keeps the best schedule.
+        -----
+        strategies: list[Strategy]
+            Scheduler configurations to race; each runs in its own process.
+        quantities: bool
+            Whether item quantities must be purchased. Schedules of strategies solving the problem
+            without quantities (e.g. model2) then purchase the quantities on their tour where stock allows.
+        """
+        super().__init__(input_data, metrics)
+        self._strategies = strategies
+        self.quantities = quantities
+        self.winner = None # name of the strategy of the last schedule
+        self.results = []
+
+    def config(self) -> dict:
+        strategies = [{"name": strategy.name, "scheduler_cls": strategy.scheduler_cls.__name__,
+                       "scheduler_params": strategy.scheduler_params, "schedule_params": strategy.schedule_params,
+                       "quantities": strategy.quantities} for strategy in self._strategies]
+        return dict(super().config(), strategies=strategies, quantities=self.quantities)
+
+    def schedule(self, kpi_cost=1, kpi_distance=1, deadline: float = 10) -> Schedule:
+        """
+        Returns the schedule with the lowest objective (kpi_cost * cost + kpi_distance * duration)
+        found by the strategies within deadline seconds. Strategies still running at the deadline
+        are terminated. The name of the winning strategy is stored in self.winner.
+        """
+        with measure(self.metrics, "solve"):
+            defaults = {"kpi_cost": kpi_cost, "kpi_distance": kpi_distance, "time_limit": SOLVER_SHARE * deadline}
+            start = perf_counter()
+            running = dict()
+            for strategy in self._strategies:
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=_run_strategy, args=(self._input_data, strategy, defaults, sender), daemon=True)
+                process.start()
+                sender.close()
+                running[receiver] = (strategy, process)
+
+            self.results = []
+            while running:
+                ready = wait(list(running), timeout=max(0, start + deadline - perf_counter()))
+                if not ready:
+                    break
+                for receiver in ready:
+                    strategy, process = running.pop(receiver)
+                    try:
+                        records, seconds, error = receiver.recv()
+                    except EOFError: # process died without a result
+                        records, seconds, error = None, perf_counter() - start, "Process ended without result"
+                    process.join()
+                    self.results.append(self._result(strategy, records, seconds, error, kpi_cost, kpi_distance))
+
+            for receiver, (strategy, process) in running.items():
+                process.terminate()
+                process.join()
+                self.results.append(StrategyResult(strategy.name, None, None, perf_counter() - start, "Deadline exceeded"))
+
+        solved = [result for result in self.results if result.objective is not None]
+        if not solved:
+            raise RuntimeError(f"No strategy found a schedule within {deadline}s: {self.results}")
+        best = min(solved, key=lambda result: result.objective)
+        self.winner = best.name
+        return best.schedule
+
+    def _result(self, strategy: Strategy, records: list[tuple], seconds: float, error: str,
+                kpi_cost: float, kpi_distance: float) -> StrategyResult:
+        if records is None:
+            return StrategyResult(strategy.name, None, None, seconds, error)
+        schedule = Schedule.from_records(records, self._input_data, self.metrics)
+        if self.quantities and not strategy.quantities:
+            schedule = self._repair(schedule, kpi_cost, kpi_distance)
+            if schedule is None:
+                return StrategyResult(strategy.name, None, None, seconds, "Shops of the tour cannot supply the quantities")
+        if not self._solves(schedule):
+            return StrategyResult(strategy.name, schedule, None, seconds, "Schedule does not solve the problem")
+        return StrategyResult(strategy.name, schedule, kpi_cost * schedule.cost + kpi_distance * schedule.duration, seconds)
+
+    def _repair(self, schedule: Schedule, kpi_cost: float, kpi_distance: float) -> Schedule:
+        # purchase each item at the cheapest shops of the tour within stock; None if the stock does not suffice
+        tour = Tour.from_schedule(schedule, self._input_data, kpi_cost, kpi_distance)
+        amounts = LocalSearch(self._input_data, kpi_cost, kpi_distance).purchases(tour.shops)
+        if amounts is None:
+            return None
+        return Tour(self._input_data, tour.shops, tour.routes, amounts, kpi_cost, kpi_distance).to_schedule(self.metrics)
+
+    def _solves(self, schedule: Schedule) -> bool:
+        results = ScheduleValidator(self._input_data, schedule).results()
+        results.pop("ShopsAreVisitedOnce") # not required for a valid schedule
+        if not all(results.values()):
+            return False
+        if self.quantities:
+            purchased = schedule.to_itemdict()
+            return all(purchased.get(item.name, 0) >= item.quantity for item in self._input_data.items if item.name != "originsauce")
+        return True
@@ -0,0 +1,118 @@
+from input_data import InputData
+from shop import Shop
+
+class PresolveReport:
+    def __init__(self, shops_removed: int, offers_removed: int, forced_shops: set[str],
+                 variables_removed: int, constraints_removed: int) -> None:
+        """
+        Summary of the reductions made by the Presolver.
+        Variable and constraint counts refer to the model3 formulation, or to model2 if item
+        quantities are left out; visits to forced shops are fixed on top of these reductions.
+        """
+        self.shops_removed = shops_removed
+        self.offers_removed = offers_removed
+        self.forced_shops = forced_shops
+        self.variables_removed = variables_removed
+        self.constraints_removed = constraints_removed
+
+    def __repr__(self) -> str:
+        return (f"Removed {self.shops_removed} shops, {self.offers_removed} offers, "
+                f"{self.variables_removed} variables and {self.constraints_removed} constraints; "
+                f"forced shops: {sorted(self.forced_shops)}")
+
+def model_size(input_data: InputData, quantities: bool = True) -> tuple[int, int]:
+    """
+    Returns the number of (variables, constraints) of model3 built on the input data, or of model2
+    if quantities is false. Both use MTZ tour constraints; forced shops are not counted.
+    """
+    num_shops = len(input_data.shops)
+    num_items = len(input_data.items)
+    arcs = input_data.route_arcs
+    num_variables = num_items * num_shops + 2 * num_shops + len(arcs)
+    # model3 bounds every purchase by stock, model2 links the purchases of each shop to its visit
+    num_purchase_links = num_items * num_shops if quantities else num_shops
+    num_constraints = 2 * num_items + num_purchase_links + 2 * num_shops + sum(1 for arc in arcs if arc[0] > 0)
+    return num_variables, num_constraints
+
+class Presolver:
+    """
+    Reduces input data before a model is built on it:
+    - offers for listed items that are dominated by a cheaper offer of a shop
+      at the same location (with enough stock for the whole item) are removed,
+    - shops without offers for listed items are removed, unless they are the origin or
+      an endpoint of a paid route (walking routes satisfy the triangle inequality),
+    - shops that must be visited to purchase some item are marked as forced.
+    If quantities is false (model1, model2), only the sole seller of an item is forced.
+    """
+    def __init__(self, input_data: InputData, quantities: bool = True) -> None:
+        self._input_data = input_data
+        self._quantities = quantities
+        self.report = None
+
+    def presolve(self) -> InputData:
+        """
+        Returns the reduced input data and stores a PresolveReport in self.report.
+        """
+        data = self._input_data
+        stock = data.stock_matrix
+        offered = data.offer_matrix.copy()
+
+        # remove offers dominated by a shop at the same location
+        shops_by_location = dict()
+        for j, shop in enumerate(data.shops):
+            shops_by_location.setdefault(tuple(shop.location), []).append(j)
+        for i, item in enumerate(data.items):
+            for colocated in shops_by_location.values():
+                for a in colocated:
+                    offered[i, a] = offered[i, a] and not any(self._dominates(i, b, a, item.quantity) for b in colocated)
+        offers_removed = int(data.offer_matrix.sum() - offered.sum())
+
+        # keep the origin, shops with at least one relevant offer and shops at either end of a
+        # paid route (these may be visited as a transfer point between two shops)
+        transfers = set()
+        for route in data.routes:
+            if route.cost > 0 and route.shop_from != route.shop_to:
+                transfers.update((route.shop_from, route.shop_to))
+        kept = [j for j, shop in enumerate(data.shops) if j == 0 or offered[:, j].any() or shop.name in transfers]
+        shops = []
+        for j in kept:
+            shop = data.shops[j]
+            listed = [item.name for i, item in enumerate(data.items) if offered[i, j]]
+            shops.append(Shop(shop.name,
+                              shop.location,
+                              {name: shop.price_by_product[name] for name in listed},
+                              {name: shop.stock_by_product[name] for name in listed}))
+        kept_names = set(shop.name for shop in shops)
+        routes = [route for route in data.routes if route.shop_from in kept_names and route.shop_to in kept_names]
+
+        # force shops without which the remaining stock of an item is too low
+        forced_shops = set(data.forced_shops)
+        available = stock * offered
+        for i, item in enumerate(data.items):
+            total = available[i].sum()
+            quantity = item.quantity if self._quantities else 1
+            for j in kept:
+                if offered[i, j] and total - available[i, j] < quantity:
+                    forced_shops.add(data.shops[j].name)
+        forced_shops &= kept_names
+
+        reduced = InputData(data.origin, shops, data.items, routes, forced_shops)
+        variables_before, constraints_before = model_size(data, self._quantities)
+        variables_after, constraints_after = model_size(reduced, self._quantities)
+        self.report = PresolveReport(shops_removed=len(data.shops) - len(shops),
+                                     offers_removed=offers_removed,
+                                     forced_shops=forced_shops,
+                                     variables_removed=variables_before - variables_after,
+                                     constraints_removed=constraints_before - constraints_after)
+        return reduced
+
+    def _dominates(self, i: int, b: int, a: int, quantity: int) -> bool:
+        # offer of item i at shop b dominates the offer at shop a
+        prices = self._input_data.price_matrix
+        stock = self._input_data.stock_matrix
+        offered = self._input_data.offer_matrix
+        if b == a or not offered[i, b] or stock[i, b] < quantity:
+            return False
+        if prices[i, b] == prices[i, a]:
+            return b < a
+        return prices[i, b] < prices[i, a]
@@ -1,5 +1,9 @@
+import numpy as np
+from collections.abc import Sequence
 
 class Route:
+    __slots__ = ("shop_from", "shop_to", "time", "cost")
+
     def __init__(self, shop_from: str, shop_to: str, time: float, cost: float) -> None:
         self.shop_from = shop_from
         self.shop_to = shop_to
@@ -7,4 +11,83 @@ class Route:
         self.cost = cost
 
     def __repr__(self) -> str:
-        return f"{self.shop_from} -> {self.shop_to} in {self.time} for {self.cost}"
\ No newline at end of file
+        return f"{self.shop_from} -> {self.shop_to} in {self.time} for {self.cost}"
+
+class RouteTable(Sequence):
+    def __init__(self, shop_names: list[str], shop_from: np.ndarray, shop_to: np.ndarray, time: np.ndarray, cost: np.ndarray) -> None:
+        """
+        Routes stored as columns instead of one Route object per route; indexing returns a Route built on demand.
+        -----
+        shop_names: list[str]
+            Names of the shops. The position of a shop in the list is its shop id.
+        shop_from, shop_to: np.ndarray
+            Shop ids of the start and end of each route.
+        time, cost: np.ndarray
+            Time and cost of each route.
+        Routes are grouped by (from, to) pair, keeping their given order within a pair:
+        the route number of a route is its position within its pair.
+        """
+        self.shop_names = list(shop_names)
+        keys = np.asarray(shop_from, dtype=np.int64) * len(self.shop_names) + np.asarray(shop_to, dtype=np.int64)
+        order = np.argsort(keys, kind="stable")
+        self.pair_keys = keys[order]
+        self.shop_from = np.asarray(shop_from, dtype=np.int32)[order]
+        self.shop_to = np.asarray(shop_to, dtype=np.int32)[order]
+        self.time = np.asarray(time, dtype=float)[order]
+        self.cost = np.asarray(cost, dtype=float)[order]
+
+        # route number of each route: its position after the first route of the same pair
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = self.pair_keys[1:] != self.pair_keys[:-1]
+        starts = np.flatnonzero(first)
+        self.route_num = np.arange(len(keys)) - np.repeat(starts, np.diff(np.append(starts, len(keys))))
+
+    @classmethod
+    def from_routes(cls, routes: list[Route], shop_names: list[str]):
+        """
+        Returns the table of the given routes between the named shops.
+        """
+        shop_ids = {name: j for j, name in enumerate(shop_names)}
+        if any(route.shop_from not in shop_ids or route.shop_to not in shop_ids for route in routes):
+            raise Exception("Encountered unknown shop name")
+        return cls(shop_names,
+                   np.array([shop_ids[route.shop_from] for route in routes], dtype=np.int32),
+                   np.array([shop_ids[route.shop_to] for route in routes], dtype=np.int32),
+                   np.array([route.time for route in routes], dtype=float),
+                   np.array([route.cost for route in routes], dtype=float))
+
+    def select(self, mask: np.ndarray):
+        """
+        Returns the table of the routes for which mask is true.
+        """
+        return RouteTable(self.shop_names, self.shop_from[mask], self.shop_to[mask], self.time[mask], self.cost[mask])
+
+    def pair(self, shop_from: int, shop_to: int) -> range:
+        """
+        Returns the positions of the routes from shop_from to shop_to (shop ids), in route number order.
+        """
+        key = shop_from * len(self.shop_names) + shop_to
+        return range(int(np.searchsorted(self.pair_keys, key, "left")), int(np.searchsorted(self.pair_keys, key, "right")))
+
+    def max_routes(self) -> int:
+        """
+        Returns the maximum number of routes across any ordered pair of shops.
+        """
+        return int(self.route_num.max()) + 1 if len(self) else 0
+
+    def __getitem__(self, index: int) -> Route:
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        return Route(self.shop_names[self.shop_from[index]], self.shop_names[self.shop_to[index]],
+                     self.time[index].item(), self.cost[index].item())
+
+    def __iter__(self):
+        names = self.shop_names
+        for k, j, time, cost in zip(self.shop_from.tolist(), self.shop_to.tolist(), self.time.tolist(), self.cost.tolist()):
+            yield Route(names[k], names[j], time, cost)
+
+    def __len__(self) -> int:
+        return len(self.pair_keys)
+
+    def __repr__(self) -> str:
+        return f"RouteTable of {len(self)} routes between {len(self.shop_names)} shops"
@@ -1,14 +1,19 @@
 from abc import ABC, abstractmethod
+from functools import cached_property
 from item import Item
 from shop import Shop
 from route import Route
 from constants import CBLUE, CBLUE2, CBOLD, CGREEN, CVIOLET, CYELLOW, CEND
 
 class Decision(ABC):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
 class ShopDecision(Decision):
+    __slots__ = ("item", "shop", "quantity")
+
     def __init__(self, item: Item, shop: Shop, quantity: int = 1) -> None:
         self.item = item
         self.shop = shop
@@ -18,6 +23,8 @@ class ShopDecision(Decision):
         return f"{self.shop.name}: {self.item.name}"
     
 class TravelDecision(Decision):
+    __slots__ = ("route",)
+
     def __init__(self, route: Route) -> None:
         self.route = route
 
@@ -25,11 +32,18 @@ class TravelDecision(Decision):
         return f"{self.route.shop_from}: {self.route.shop_to}"
 
 class Schedule:
-    def __init__(self, origin: tuple[float, float], decisions: list[Decision]) -> None:
+    def __init__(self, origin: tuple[float, float], decisions: list[Decision], metrics = None) -> None:
+        """
+        Decisions are not changed after construction; cost and duration are computed once.
+        To modify a tour, convert it to a Tour (see tour.py) and back.
+        """
         self.origin = origin
         self.decisions = decisions
-        self.shop_decisions = [d for d in self.decisions if type(d) == ShopDecision]
-        self.travel_decisions = [d for d in self.decisions if type(d) == TravelDecision]
+        self.metrics = metrics # Metrics of the scheduler that created the schedule, if any
+        self.shop_decisions = []
+        self.travel_decisions = []
+        for decision in decisions:
+            (self.shop_decisions if isinstance(decision, ShopDecision) else self.travel_decisions).append(decision)
 
     def to_itemset(self) -> set[str]:
         """
@@ -43,13 +57,42 @@ class Schedule:
         """
         item_dict = dict()
         for decision in self.shop_decisions:
-            if decision.item_name in item_dict.keys():
-                item_dict[decision.item_name] += decision.quantity
+            if decision.item.name in item_dict.keys():
+                item_dict[decision.item.name] += decision.quantity
             else:
-                item_dict[decision.item_name] = decision.quantity
+                item_dict[decision.item.name] = decision.quantity
         return item_dict
 
-    @property
+    def to_records(self) -> list[tuple]:
+        """
+        Returns the decisions by name, not referring to the input data:
+        ("shop", item name, shop name, quantity) or ("travel", shop_from, shop_to, time, cost).
+        """
+        records = []
+        for decision in self.decisions:
+            if isinstance(decision, ShopDecision):
+                records.append(("shop", decision.item.name, decision.shop.name, decision.quantity))
+            else:
+                route = decision.route
+                records.append(("travel", route.shop_from, route.shop_to, route.time, route.cost))
+        return records
+
+    @classmethod
+    def from_records(cls, records: list[tuple], input_data, metrics = None):
+        """
+        Returns the schedule of decisions given by to_records, referring to the items and shops of input_data.
+        """
+        items = {item.name: item for item in input_data.items}
+        decisions = []
+        for kind, *values in records:
+            if kind == "shop":
+                item_name, shop_name, quantity = values
+                decisions.append(ShopDecision(items[item_name], input_data.shops[input_data.get_shop_index(shop_name)], quantity))
+            else:
+                decisions.append(TravelDecision(Route(*values)))
+        return cls(input_data.origin, decisions, metrics)
+
+    @cached_property
     def cost(self) -> float:
         """
         Returns
@@ -60,7 +103,7 @@ class Schedule:
         travel_cost = sum([decision.route.cost for decision in self.travel_decisions])
         return purchase_cost + travel_cost
 
-    @property
+    @cached_property
     def duration(self) -> float:
         """
         Returns
@@ -70,25 +113,13 @@ class Schedule:
         return sum([decision.route.time for decision in self.travel_decisions])
     
     def __iter__(self):
-        self._iter_travel = 0
-        self._iter_shop = 0
-        return self
-
-    def __next__(self):
-        # stop iteration if out of decisions (last travel means no more shop)
-        if self._iter_travel >= len(self.travel_decisions):
-            raise StopIteration
-        # return shop_decision if purchase made at current shop
-        if self._iter_shop < len(self.shop_decisions):
-            decision = self.shop_decisions[self._iter_shop]
-            current_shop = self.travel_decisions[self._iter_travel].route.shop_from
-            if decision.shop.name == current_shop:
-                self._iter_shop += 1
-                return decision
-        # return travel_decision if purchase not made and can travel
-        decision = self.travel_decisions[self._iter_travel]
-        self._iter_travel += 1
-        return decision
+        # purchases at each shop, followed by the travel away from it (last travel means no more shop)
+        shop = 0
+        for travel in self.travel_decisions:
+            while shop < len(self.shop_decisions) and self.shop_decisions[shop].shop.name == travel.route.shop_from:
+                yield self.shop_decisions[shop]
+                shop += 1
+            yield travel
 
     def __str__(self) -> str:
         schedule_string = ""
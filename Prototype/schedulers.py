@@ -1,35 +1,74 @@
+import numpy as np
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from functools import wraps
+from queue import Queue
+from threading import Event, Thread
+from docplex.mp.constants import EffortLevel
+from docplex.mp.progress import SolutionListener, ProgressClock
 from schedule import Schedule, ShopDecision, TravelDecision
 from input_data import InputData
+from item import Item
 from model1 import model1
 from model2 import model2
-from model3 import model3
-from math import inf
+from model3 import model3, model3_tour
+from heuristic import LocalSearch
+from metrics import Metrics, measure
+from constants import SESSION_CLOSED_RATIO
 
 
+def timed(phase: str):
+    """
+    Decorator timing a scheduler method as the given phase in the scheduler's metrics.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with measure(self.metrics, phase):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
 class Scheduler(ABC):
-    def __init__(self, input_data: InputData):
+    quantities = False # whether item quantities are purchased (otherwise one of each item)
+
+    def __init__(self, input_data: InputData, metrics: Metrics = None):
+        """
+        metrics: Metrics
+            Collects phase timings and model sizes; attached to the returned schedules.
+        """
         self._input_data = input_data
         self._model_solution = None
+        self.metrics = metrics
 
     @abstractmethod
     def schedule(self) -> Schedule:
         pass
 
+    def config(self) -> dict:
+        """
+        Returns the constructor configuration the schedules depend on, as plain values
+        (scheduler classes by name); used to key cached schedules.
+        """
+        return {"scheduler": type(self).__name__}
+
 class BasicScheduler(Scheduler):
     """
     Greedily schedules based on shop and route order in input data.
     For each shop schedules all items not yet purchased.
     """
+    @timed("solve")
     def schedule(self) -> Schedule:
         scheduled_items = set()
         decisions = []
         previous_shop = "origin"
-        for shop in self._input_data.shops:
+        offered = self._input_data.offer_matrix
+        for shop_id, shop in enumerate(self._input_data.shops):
             # purchase all available items at current shop
             purchase_made = False
-            for item in self._input_data.items:
-                if item.name in shop.available_products() and item.name not in scheduled_items:
+            for i, item in enumerate(self._input_data.items):
+                if offered[i, shop_id] and item.name not in scheduled_items:
                     scheduled_items.add(item.name)
                     decision = ShopDecision(item, shop)
                     decisions.append(decision)
@@ -42,29 +81,27 @@ class BasicScheduler(Scheduler):
         # add travel back to origin
         route = self._input_data.get_walking_route(previous_shop, "origin")
         decisions.append(TravelDecision(route))
-        return Schedule(self._input_data.origin, decisions)
+        return Schedule(self._input_data.origin, decisions, self.metrics)
 
 class BestPriceScheduler(Scheduler):
     """
     Creates a schedule that has minimal cost.
     Does not take distance into account.
     """
+    @timed("solve")
     def schedule(self) -> Schedule:
         decisions = []
         shop_decisions = []
 
         # for each item find cheapest shop and add shopdecision
-        for item in self._input_data.items:
+        offered = self._input_data.offer_matrix.any(axis=1)
+        unavailable = [item.name for item, available in zip(self._input_data.items, offered) if not available and item.name != "originsauce"]
+        if unavailable:
+            raise ValueError(f"Items not offered by any shop: {unavailable}")
+        cheapest_shops = self._input_data.price_matrix.argmin(axis=1)
+        for item, cheapest_shop in zip(self._input_data.items, cheapest_shops):
             if item.name == "originsauce": continue
-            cheapest_shop = None
-            best_price = inf
-            for shop in self._input_data.shops:
-                if shop.get_price(item.name) == None:
-                    continue
-                if shop.get_price(item.name) < best_price:
-                    cheapest_shop = shop
-                    best_price = shop.get_price(item.name)
-            shop_decisions.append(ShopDecision(item, cheapest_shop))
+            shop_decisions.append(ShopDecision(item, self._input_data.shops[cheapest_shop]))
 
         # add traveldecisions (walking)
         sorted_shop_decisions = sorted(shop_decisions, key= lambda x: x.shop.name)
@@ -78,100 +115,516 @@ class BestPriceScheduler(Scheduler):
         route = self._input_data.get_walking_route(previous_shop, "origin")
         decisions.append(TravelDecision(route))
 
-        return Schedule(self._input_data.origin,decisions)
+        return Schedule(self._input_data.origin,decisions, self.metrics)
+
+class IncumbentListener(SolutionListener):
+    """
+    Passes every improving solution found during the solve to a callback (if any).
+    The search is aborted once cancel is set, or when the callback raises; the exception is kept
+    in error, as exceptions raised in listeners do not reach the caller of solve().
+    """
+    def __init__(self, callback=None, cancel: Event = None) -> None:
+        super().__init__(ProgressClock.Objective)
+        self._callback = callback
+        self._cancel = cancel
+        self.error = None
+
+    def accept(self, pdata) -> bool:
+        # called on every progress notification of the search, where it can be aborted
+        if self.error is not None or (self._cancel is not None and self._cancel.is_set()):
+            self.abort()
+            return False
+        return super().accept(pdata)
+
+    def notify_solution(self, sol) -> None:
+        if self._callback is None:
+            return
+        try:
+            self._callback(sol)
+        except Exception as e:
+            self.error = e
+            self.abort()
 
 class ModelScheduler(Scheduler):
     """
     Base scheduler class for schedulers using a DOcplex model.
+    Tours are enforced by MTZ ordering constraints ("mtz") or lazy subtour elimination ("lazy").
     """
-    def model_schedule(self, model) -> Schedule:
-        msol = model.solve()
+    def __init__(self, input_data: InputData, tour_constraints: str = "mtz", metrics: Metrics = None):
+        super().__init__(input_data, metrics)
+        self._tour_constraints = tour_constraints
+
+    def config(self) -> dict:
+        return dict(super().config(), tour_constraints=self._tour_constraints)
+
+    @abstractmethod
+    def build_model(self, kpi_cost, kpi_distance):
+        pass
+
+    def schedule(self, kpi_cost=1, kpi_distance=1, warm_start: Schedule = None,
+                 time_limit: float = None, mip_gap: float = None, threads: int = None,
+                 on_incumbent=None, cancel: Event = None) -> Schedule:
+        """
+        Solves the model and returns the best schedule found.
+        -----
+        warm_start: Schedule
+            Schedule passed to the solver as MIP start.
+        time_limit: float
+            Maximum solve time in seconds; the best schedule found so far is returned.
+        mip_gap: float
+            Relative gap at which the solve stops, e.g. 0.01 for 1%.
+        threads: int
+            Number of threads used by the solver (0 or None lets CPLEX decide).
+        on_incumbent: callable
+            Called with each improving Schedule found during the solve.
+        cancel: threading.Event
+            Aborts the solve when set (e.g. from another thread); the best schedule found so far is returned.
+        """
+        with measure(self.metrics, "build"):
+            model = self.build_model(kpi_cost, kpi_distance)
+        model.round_solution = True
+        if self.metrics is not None:
+            self.metrics.count("variables", model.number_of_variables)
+            self.metrics.count("constraints", model.number_of_constraints)
+        return self.model_schedule(model, warm_start, time_limit, mip_gap, threads, on_incumbent, cancel)
+
+    def incumbents(self, kpi_cost=1, kpi_distance=1, **solver_params):
+        """
+        Generator yielding progressively better schedules while the model is solved.
+        The last schedule yielded is the final (best) schedule.
+        Takes the same parameters as schedule(), except on_incumbent and cancel.
+        Closing the generator (e.g. by breaking out of a loop over it) aborts the solve.
+        """
+        found = Queue()
+        cancel = Event()
+        def solve():
+            try:
+                found.put(self.schedule(kpi_cost, kpi_distance, on_incumbent=found.put, cancel=cancel, **solver_params))
+            except Exception as e:
+                found.put(e)
+            found.put(None)
+        thread = Thread(target=solve, daemon=True)
+        thread.start()
+        try:
+            while (schedule := found.get()) is not None:
+                if isinstance(schedule, Exception):
+                    raise schedule
+                yield schedule
+        finally:
+            cancel.set()
+            thread.join()
+
+    def pareto_front(self, points: int = 10, method: str = "weighted", processes: int = 1,
+                     **solver_params) -> list[tuple[float, float, Schedule]]:
+        """
+        Returns the non-dominated schedules trading off cost against duration, as a list of
+        (cost, duration, schedule) sorted by increasing duration (and so decreasing cost).
+        -----
+        points: int
+            Number of trade-offs solved, including the cheapest and the fastest schedule.
+        method: str
+            "weighted" minimises kpi_cost * cost + kpi_distance * duration for weights evenly spread
+            from cost only to duration only. "epsilon" minimises cost subject to duration bounds
+            evenly spread between the fastest and the cheapest schedule; it also finds trade-offs
+            that no weighting of the objective reaches.
+        processes: int
+            Number of processes solving trade-offs in parallel, each sweeping its share of them.
+        solver_params:
+            Passed to the solver for every trade-off, e.g. time_limit or mip_gap.
+        The model is built once per process and re-weighted for each trade-off; each solve is
+        warm started with the schedule of the previous trade-off.
+        """
+        if points < 2:
+            raise ValueError("A Pareto front needs at least 2 points.")
+        if method == "weighted":
+            shares = np.linspace(0, 1, points)
+            trade_offs = [(1 - share, share, None) for share in shares]
+            schedules = self._sweep_parallel(trade_offs, processes, solver_params)
+        elif method == "epsilon":
+            ends = self._sweep([(0, 1, None), (1, 0, None)], solver_params)
+            if len(ends) < 2:
+                raise RuntimeError("No fastest or cheapest schedule found within the solver limits.")
+            fastest, cheapest = ends
+            bounds = np.linspace(fastest.duration, cheapest.duration, points)[1:-1]
+            trade_offs = [(1, 0, bound) for bound in bounds] # increasing bounds keep the warm start feasible
+            schedules = [fastest, cheapest] + self._sweep_parallel(trade_offs, processes, solver_params)
+        else:
+            raise ValueError(f"Unknown Pareto front method: {method}")
+
+        front = []
+        for schedule in sorted(schedules, key=lambda schedule: (schedule.duration, schedule.cost)):
+            if not front or schedule.cost < front[-1][0] - 1e-9:
+                front.append((schedule.cost, schedule.duration, schedule))
+        return front
+
+    def _sweep_parallel(self, trade_offs: list[tuple], processes: int, solver_params: dict) -> list[Schedule]:
+        if processes <= 1 or len(trade_offs) <= 1:
+            return self._sweep(trade_offs, solver_params)
+        # contiguous shares, so that warm starts come from neighbouring trade-offs
+        shares = [list(share) for share in np.array_split(np.arange(len(trade_offs)), min(processes, len(trade_offs)))]
+        with ProcessPoolExecutor(len(shares)) as pool:
+            futures = [pool.submit(_sweep_trade_offs, type(self), self._input_data, self._tour_constraints,
+                                   [trade_offs[t] for t in share], solver_params) for share in shares]
+            return [Schedule.from_records(records, self._input_data, self.metrics)
+                    for future in futures for records in future.result()]
+
+    def _sweep(self, trade_offs: list[tuple], solver_params: dict) -> list[Schedule]:
+        """
+        Solves the trade-offs (kpi_cost, kpi_distance, duration bound or None) in order with a
+        single model and returns their schedules; trade-offs without a solution within the solver
+        limits are left out.
+        If a weight is 0, its term is only minimised among the optima of the other term: the other
+        term is minimised first and then bounded by its optimum.
+        """
+        with measure(self.metrics, "build"):
+            model = self.build_model(1, 1)
+        model.round_solution = True
+        cost, duration = model.objective_terms
+        schedules = []
+        solver_params = dict(solver_params)
+        previous = solver_params.pop("warm_start", None)
+        for kpi_cost, kpi_distance, bound in trade_offs:
+            constraint = model.add_constraint(duration <= bound) if bound is not None else None
+            try:
+                if kpi_cost == 0 or kpi_distance == 0:
+                    first, second = (cost, duration) if kpi_distance == 0 else (duration, cost)
+                    previous = self._lexicographic(model, first, second, previous, solver_params)
+                else:
+                    model.set_objective(sense = 'min', expr = kpi_cost * cost + kpi_distance * duration)
+                    previous = self.model_schedule(model, previous, **solver_params)
+                schedules.append(previous)
+            except RuntimeError:
+                if not model.solve_details.has_hit_limit():
+                    raise
+            finally:
+                if constraint is not None:
+                    model.remove_constraint(constraint)
+        return schedules
+
+    def _lexicographic(self, model, first, second, warm_start: Schedule, solver_params: dict) -> Schedule:
+        # two weighted solves rather than a multi-objective, which the lazy tour constraints do not support
+        model.set_objective(sense = 'min', expr = first)
+        schedule = self.model_schedule(model, warm_start, **solver_params)
+        optimum = model.objective_value
+        constraint = model.add_constraint(first <= optimum + 1e-6 * max(1, abs(optimum)))
+        try:
+            model.set_objective(sense = 'min', expr = second)
+            return self.model_schedule(model, schedule, **solver_params)
+        except RuntimeError:
+            if not model.solve_details.has_hit_limit():
+                raise
+            return schedule
+        finally:
+            model.remove_constraint(constraint)
+
+    def model_schedule(self, model, warm_start: Schedule = None, time_limit: float = None,
+                       mip_gap: float = None, threads: int = None, on_incumbent=None, cancel: Event = None) -> Schedule:
+        model.parameters.reset()
+        model.clear_mip_starts()
+        if warm_start is not None:
+            self.add_warm_start(model, warm_start)
+        if time_limit is not None:
+            model.parameters.timelimit = time_limit
+        if mip_gap is not None:
+            model.parameters.mip.tolerances.mipgap = mip_gap
+        if threads is not None:
+            model.parameters.threads = threads
+        listener = None
+        if on_incumbent is not None or cancel is not None:
+            callback = (lambda sol: on_incumbent(self.decode(sol))) if on_incumbent is not None else None
+            listener = IncumbentListener(callback, cancel)
+            model.add_progress_listener(listener)
+        try:
+            with measure(self.metrics, "solve"):
+                msol = model.solve()
+        finally:
+            if listener is not None:
+                model.remove_progress_listener(listener)
+        if listener is not None and listener.error is not None:
+            raise listener.error
+        if msol is None:
+            raise RuntimeError(f"No solution found: {model.solve_details.status}.")
+        with measure(self.metrics, "decode"):
+            return self.decode(msol)
+
+    def decode(self, msol) -> Schedule:
+        """
+        Returns the schedule described by a model solution.
+        All purchase and travel values are fetched at once through the variables kept on the model.
+        """
+        model = msol.model
+        num_items = len(self._input_data.items)
+        num_shops = len(self._input_data.shops)
+        purchases = np.rint(msol.get_values([var for row in model.purchase_vars for var in row])).astype(int)
+        purchases = purchases.reshape(num_items, num_shops)
+        travels = np.rint(msol.get_values(model.travel_vars))
+
+        # successor arc of each shop in the tour
+        successor = [None] * num_shops
+        for a in np.flatnonzero(travels == 1):
+            arc = model.travel_arcs[a]
+            successor[arc[0]] = arc
 
         decisions = []
         current_shop = 0 # start at origin (index 0)
-
-        for _ in range(len(self._input_data.shops)): # continue until back at origin (at most all shops)
+        for _ in range(num_shops): # continue until back at origin (at most all shops)
             # add current shop items
             if current_shop != 0:
-                purchases = self.get_shop_decisions(msol, current_shop)
-                decisions.extend(purchases)
-            
+                for i in np.flatnonzero(purchases[:, current_shop] > 0):
+                    decisions.append(ShopDecision(self._input_data.items[i], self._input_data.shops[current_shop], int(purchases[i, current_shop])))
+
             # set next shop
-            travel = self.get_travel_decision(msol, current_shop)
-            decisions.append(travel)
-            current_shop = self._input_data.get_shop_index(travel.route.shop_to)
-  
+            if successor[current_shop] is None:
+                raise LookupError(f"Unable to find TravelDecision originating at {current_shop} in the solution.")
+            (shop_from, shop_to, route_num) = successor[current_shop]
+            decisions.extend(TravelDecision(route) for route in self.arc_routes(shop_from, shop_to, route_num))
+            current_shop = shop_to
+
             # terminate loop if at origin again
-            if current_shop == 0 and len(decisions) > 0:
-                return Schedule(self._input_data.origin, decisions)
+            if current_shop == 0:
+                return Schedule(self._input_data.origin, decisions, self.metrics)
 
         raise RuntimeError("Traversed all shops without returning to origin.")
 
-    def get_travel_decision(self, solution, shop_from):
+    def arc_routes(self, shop_from, shop_to, route_num):
         """
-        Returns the TravelDecision originating at shop_from in the solution.
+        Returns the routes of a travel arc (from, to, route_num).
         """
-        num_shops = len(self._input_data.shops)
-        num_routes = self._input_data.max_routes()
-        route_matrix = self._input_data.route_matrix(eq_num_routes=True)
-        for shop_to in range(num_shops):
-            for route_num in range(num_routes):
-                if solution.get_value(f"e_{shop_from}_{shop_to}_{route_num}") == 1:
-                    shop_from_name = self._input_data.shops[shop_from].name
-                    shop_to_name = self._input_data.shops[shop_to].name
-                    route = route_matrix[shop_from_name, shop_to_name][route_num]
-                    return TravelDecision(route)
-        raise LookupError(f"Unable to find TravelDecision originating at {shop_from} in the solution.")
-    
-    def get_shop_decisions(self, solution, shop):
+        return self._input_data.arc_routes(shop_from, shop_to, route_num)
+
+    def add_warm_start(self, model, schedule: Schedule) -> None:
         """
-        Returns a list of ShopDecisions made at a given shop in the solution.
+        Adds a schedule as MIP start to the model, e.g. from another scheduler or an earlier run.
+        Shops and items of the schedule that are not in the input data are ignored;
+        CPLEX repairs the start if it is infeasible (e.g. if stock has changed).
         """
-        num_items = len(self._input_data.items)
-        shop_decisions = []
-        for i in range(0, num_items):
-            quantity = int(solution.get_value(f"x_{i}_{shop}"))
-            if quantity > 0:
-                shop_decisions.append(ShopDecision(self._input_data.items[i], self._input_data.shops[shop], quantity))
-        return shop_decisions
+        start = model.new_solution()
+        for name, value in self.start_values(schedule).items():
+            var = model.get_var_by_name(name)
+            if var is not None:
+                start.add_var_value(var, min(value, var.ub))
+        model.add_mip_start(start, effort_level=EffortLevel.Repair)
+
+    def start_values(self, schedule: Schedule) -> dict[str, float]:
+        """
+        Returns dictionary of model variable values describing the schedule: (name, value).
+        """
+        data = self._input_data
+        item_index = {item.name: i for i, item in enumerate(data.items)}
+        values = dict()
+
+        # travel variables and tour order of the visited shops (the origin comes last)
+        tour = []
+        for decision in schedule.travel_decisions:
+            route = decision.route
+            if route.shop_from not in data.shop_by_name or route.shop_to not in data.shop_by_name:
+                continue
+            shop_from, shop_to = data.get_shop_index(route.shop_from), data.get_shop_index(route.shop_to)
+            name = self.travel_variable(shop_from, shop_to, route)
+            if name is not None:
+                values[name] = 1
+            if shop_to != 0:
+                tour.append(shop_to)
+        for position, shop in enumerate(tour):
+            values[f"s_{shop}"] = 1
+            values[f"u_{shop}"] = position
+        values["s_0"] = 1
+        values["u_0"] = len(tour)
+
+        # purchase variables
+        for decision in schedule.shop_decisions:
+            if decision.item.name in item_index and decision.shop.name in data.shop_by_name:
+                name = self.purchase_variable(item_index[decision.item.name], data.get_shop_index(decision.shop.name))
+                values[name] = values.get(name, 0) + decision.quantity
+        return values
+
+    def purchase_variable(self, item, shop):
+        """
+        Returns the name of the variable for purchasing item (index) at shop (index).
+        """
+        return f"x_{item}_{shop}"
+
+    def travel_variable(self, shop_from, shop_to, route):
+        """
+        Returns the name of the travel variable for taking route from shop_from to shop_to.
+        If the route is dominated, a non-dominated route at most as slow and expensive is used.
+        Returns None if there is no such route.
+        """
+        times, costs = self._input_data.route_time_array, self._input_data.route_cost_array
+        for r in self._input_data.arcs_by_pair.get((shop_from, shop_to), []):
+            if times[shop_from, shop_to, r] <= route.time and costs[shop_from, shop_to, r] <= route.cost:
+                return f"e_{shop_from}_{shop_to}_{r}"
+        return None
+
+def _sweep_trade_offs(scheduler_cls, input_data: InputData, tour_constraints: str, trade_offs: list[tuple], solver_params: dict) -> list[list[tuple]]:
+    # runs in a worker process; schedules are returned as records (see Schedule.to_records)
+    scheduler = scheduler_cls(input_data, tour_constraints)
+    return [schedule.to_records() for schedule in scheduler._sweep(trade_offs, solver_params)]
 
 class Model1Scheduler(ModelScheduler):
     """
     Schedules using model1.
     """ 
-    def schedule(self, kpi_cost=1, kpi_distance=1) -> Schedule:
-        model = model1(self._input_data, kpi_cost, kpi_distance)
-        model.round_solution = True
-        return self.model_schedule(model)
+    def build_model(self, kpi_cost, kpi_distance):
+        return model1(self._input_data, kpi_cost, kpi_distance, self._tour_constraints)
 
-    def get_travel_decision(self, solution, shop_from):
+    def arc_routes(self, shop_from, shop_to, route_num):
         """
-        Returns the TravelDecision originating at shop_from in the solution.
+        Returns the walking route from shop_from to shop_to.
         """
-        num_shops = len(self._input_data.shops)
-        for shop_to in range(num_shops):
-            if solution.get_value(f"e_{shop_from}_{shop_to}") == 1:
-                shop_from_name = self._input_data.shops[shop_from].name
-                shop_to_name = self._input_data.shops[shop_to].name
-                route = self._input_data.get_walking_route(shop_from_name, shop_to_name)
-                return TravelDecision(route)
-        raise LookupError(f"Unable to find TravelDecision originating at {shop_from} in the solution.")
+        return [self._input_data.get_walking_route(self._input_data.shops[shop_from].name, self._input_data.shops[shop_to].name)]
+
+    def travel_variable(self, shop_from, shop_to, route):
+        """
+        Returns the name of the travel variable for traveling from shop_from to shop_to.
+        """
+        return f"e_{shop_from}_{shop_to}" if shop_from != shop_to else None
 
 class Model2Scheduler(ModelScheduler):
     """
     Schedules using model2.
     """  
-    def schedule(self, kpi_cost=1, kpi_distance=1) -> Schedule:
-        model = model2(self._input_data, kpi_cost, kpi_distance)
-        model.round_solution = True
-        return self.model_schedule(model)
+    def build_model(self, kpi_cost, kpi_distance):
+        return model2(self._input_data, kpi_cost, kpi_distance, self._tour_constraints)
         
     
 class Model3Scheduler(ModelScheduler):
     """
     Schedules using model3.
     """  
-    def schedule(self, kpi_cost=1, kpi_distance=1) -> Schedule:
-        model = model3(self._input_data, kpi_cost, kpi_distance)
-        model.round_solution = True
-        return self.model_schedule(model)
\ No newline at end of file
+    quantities = True
+
+    def build_model(self, kpi_cost, kpi_distance):
+        return model3(self._input_data, kpi_cost, kpi_distance, self._tour_constraints)
+
+class Model3Session(Model3Scheduler):
+    """
+    Schedules many shopping lists with a persistent model3 for the same shops and routes.
+    The tour part of the model is built once; for each shopping list only the purchase
+    variables, purchase constraints and objective are replaced before solving again.
+    Purchase variables of products no longer listed are closed, to be reopened if they are listed
+    again; DOcplex cannot remove variables, so the model is rebuilt once the closed variables
+    exceed closed_ratio times the variables of the tour part. The number of rebuilds is counted
+    in the metrics as "rebuilds".
+    """
+    def __init__(self, input_data: InputData, tour_constraints: str = "mtz", metrics: Metrics = None,
+                 closed_ratio: float = SESSION_CLOSED_RATIO):
+        super().__init__(input_data, tour_constraints, metrics)
+        self._base_data = input_data
+        self._closed_ratio = closed_ratio
+        self._build_tour()
+        self.rebuilds = 0 # times the model was rebuilt to drop closed variables
+
+    def _build_tour(self) -> None:
+        self._model, self._s, self._travel_cost, self._travel_time = model3_tour(self._base_data, self._tour_constraints)
+        self._tour_variables = self._model.number_of_variables
+        self._x = dict() # product name -> purchase variables, one per shop
+        self._listed = set() # products with open purchase variables
+        self._item_constraints = []
+
+    def schedule_items(self, items: list[Item], kpi_cost=1, kpi_distance=1, **solver_params) -> Schedule:
+        """
+        Schedules another shopping list. solver_params are passed to schedule().
+        """
+        self._input_data = self._base_data.with_items(items)
+        return self.schedule(kpi_cost, kpi_distance, **solver_params)
+
+    def build_model(self, kpi_cost, kpi_distance):
+        data = self._input_data
+        model = self._model
+        names = [item.name for item in data.items]
+        if len(set(names)) < len(names):
+            raise ValueError("Shopping list contains duplicate items.")
+        s_labels = range(len(data.shops))
+        closed = len(set(self._x) - set(names)) * len(data.shops)
+        if closed > self._closed_ratio * self._tour_variables:
+            self._build_tour()
+            self.rebuilds += 1
+        if self.metrics is not None:
+            self.metrics.count("rebuilds", self.rebuilds)
+        model = self._model
+
+        # close purchase variables of products no longer listed, open (or create) those of listed products
+        for name in self._listed - set(names):
+            model.change_var_upper_bounds(self._x[name], 0)
+        for name in set(names) - self._listed:
+            if name in self._x:
+                model.change_var_upper_bounds(self._x[name], None)
+            else:
+                self._x[name] = model.integer_var_list(len(data.shops), lb = 0, name = f"x_{name}")
+        self._listed = set(names)
+        model.remove_constraints(self._item_constraints)
+
+        x = [self._x[name] for name in names]
+        p = data.price_matrix
+        z = data.stock_matrix
+
+        # objective function: minimize cost
+        obj_cost = model.scal_prod([var for x_i in x for var in x_i], p.ravel()) + self._travel_cost
+        model.set_objective(sense = 'min', expr = kpi_cost * obj_cost + kpi_distance * self._travel_time)
+
+        # every item is purchased, within stock and only if the shop is visited (not offered means no stock)
+        constraints = [model.sum(x_i) >= item.quantity for x_i, item in zip(x, data.items)]
+        constraints += [x[i][j] <= self._s[j] * z[i,j] for i in range(len(x)) for j in s_labels]
+        constraints += [self._s[data.get_shop_index(name)] == 1 for name in data.forced_shops]
+        self._item_constraints = model.add_constraints(constraints)
+
+        # variables kept for decoding and objective terms kept for re-weighting
+        model.purchase_vars = x
+        model.objective_terms = (obj_cost, self._travel_time)
+        return model
+
+    def purchase_variable(self, item, shop):
+        return f"x_{self._input_data.items[item].name}_{shop}"
+
+class HeuristicScheduler(Scheduler):
+    """
+    Schedules using a construction and local search heuristic (no solver required).
+    Takes item quantities, stock and multiple routes into account, like model3.
+    """
+    quantities = True
+
+    def schedule(self, kpi_cost=1, kpi_distance=1, time_limit=None) -> Schedule:
+        with measure(self.metrics, "solve"):
+            start = perf_counter()
+            search = LocalSearch(self._input_data, kpi_cost, kpi_distance)
+            tour = search.solve(self._remaining(time_limit, start))
+        with measure(self.metrics, "decode"):
+            return self.decode(search, tour)
+
+    @staticmethod
+    def _remaining(time_limit: float, start: float) -> float:
+        # time limit left for the search after setting it up, so that the limit holds for the whole schedule
+        return None if time_limit is None else max(0, time_limit - (perf_counter() - start))
+
+    def decode(self, search: LocalSearch, tour: list[int]) -> Schedule:
+        """
+        Returns the schedule visiting the shops of the tour in order.
+        """
+        amounts = search.purchases(tour)
+        decisions = []
+        stops = [0] + tour + [0]
+        for shop_from, shop_to in zip(stops[:-1], stops[1:]):
+            shop = self._input_data.shops[shop_from]
+            for i, item in enumerate(self._input_data.items):
+                if amounts[i, shop_from] > 0:
+                    decisions.append(ShopDecision(item, shop, int(amounts[i, shop_from])))
+            if shop_from == shop_to: # empty tour
+                routes = [self._input_data.get_walking_route(shop.name, shop.name)]
+            else:
+                routes = self._input_data.arc_routes(shop_from, shop_to, int(search.hop_route[shop_from, shop_to]))
+            decisions.extend(TravelDecision(route) for route in routes)
+        return Schedule(self._input_data.origin, decisions, self.metrics)
+
+class BestPriceTourScheduler(HeuristicScheduler):
+    """
+    Visits the cheapest shops of the items, like BestPriceScheduler, but within stock and in
+    a tour shortened by 2-opt, taking the cheapest route between shops.
+    """
+    def schedule(self, kpi_cost=1, kpi_distance=1, time_limit=None) -> Schedule:
+        with measure(self.metrics, "solve"):
+            start = perf_counter()
+            search = LocalSearch(self._input_data, kpi_cost, kpi_distance)
+            tour = search.best_price_tour(self._remaining(time_limit, start))
+        with measure(self.metrics, "decode"):
+            return self.decode(search, tour)
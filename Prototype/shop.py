@@ -1,6 +1,8 @@
 from math import sqrt
 
 class Shop:
+    __slots__ = ("name", "location", "price_by_product", "stock_by_product")
+
     def __init__(self,
                  name: str,
                  location: tuple[float, float],
@@ -15,7 +17,7 @@ class Shop:
         """
         Returns the stock of the product given, or 0 if not offered in shop.
         """
-        if product_name in self.available_products():
+        if product_name in self.price_by_product and product_name in self.stock_by_product:
             return self.stock_by_product[product_name]
         return 0
     
@@ -23,7 +25,7 @@ class Shop:
         """
         Returns the price of the product given, or None if not offered in shop.
         """
-        if product_name in self.available_products():
+        if product_name in self.price_by_product and product_name in self.stock_by_product:
             return self.price_by_product[product_name]
         return None
 
@@ -0,0 +1,65 @@
+from cplex.callbacks import LazyConstraintCallback
+from docplex.mp.callbacks.cb_mixin import ConstraintCallbackMixin
+
+class SubtourCallback(ConstraintCallbackMixin, LazyConstraintCallback):
+    """
+    Lazy constraint callback separating subtour elimination constraints.
+    Called for every integer solution; for each cycle that does not contain the origin
+    (shop 0) the constraint "some arc leaves the cycle if shop m is visited" is added
+    for every shop m in the cycle.
+    """
+    def __init__(self, env) -> None:
+        LazyConstraintCallback.__init__(self, env)
+        ConstraintCallbackMixin.__init__(self)
+        self.arcs = None # (from, to) -> list of travel variables
+        self.visits = None # shop -> visit variable
+        self.num_cuts = 0
+
+    def __call__(self) -> None:
+        solution = self.make_solution_from_vars([var for variables in self.arcs.values() for var in variables])
+        successor = {k: j for (k, j), variables in self.arcs.items()
+                     if any(solution.get_value(var) > 0.5 for var in variables)}
+        for cycle in subtours(successor):
+            leaving = [var for (k, j), variables in self.arcs.items() if k in cycle and j not in cycle for var in variables]
+            for shop in cycle:
+                ct = self.model.sum(leaving) >= self.visits[shop]
+                lhs, sense, rhs = self.linear_ct_to_cplex(ct)
+                self.add(lhs, sense, rhs)
+                self.num_cuts += 1
+
+def subtours(successor: dict[int, int]) -> list[set[int]]:
+    """
+    Returns the cycles in a successor mapping that do not contain the origin (shop 0).
+    """
+    cycles = []
+    seen = {0}
+    current = successor.get(0)
+    while current is not None and current not in seen: # tour through the origin
+        seen.add(current)
+        current = successor.get(current)
+    for start in successor:
+        if start in seen:
+            continue
+        cycle = set()
+        current = start
+        while current is not None and current not in seen:
+            seen.add(current)
+            cycle.add(current)
+            current = successor.get(current)
+        if current in cycle:
+            cycles.append(cycle)
+    return cycles
+
+def add_subtour_callback(model, arcs: dict, visits: list) -> SubtourCallback:
+    """
+    Registers a SubtourCallback on the model, replacing the MTZ ordering constraints.
+    -----
+    arcs: dict
+        Dictionary of travel variables: ((from, to), list of variables), one per route.
+    visits: list
+        Visit variables s_j of the shops.
+    """
+    callback = model.register_callback(SubtourCallback)
+    callback.arcs = arcs
+    callback.visits = visits
+    return callback
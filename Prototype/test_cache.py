@@ -0,0 +1,33 @@
+import random
+from data_generator import DataGenerator
+from input_data import InputData
+from schedulers import HeuristicScheduler, Model3Scheduler
+from decomposition import DecompositionScheduler
+from cache import SolutionCache, CachingScheduler
+
+def _input_data(path) -> InputData:
+    random.seed(0)
+    DataGenerator('shop_names.txt', 'product_names.txt', num_items=4, num_shops=12, num_products=40).to_csv(True, f"{path}/")
+    return InputData.from_csv(f"{path}/")
+
+def test_configurations_of_a_scheduler_do_not_share_entries(tmp_path):
+    data = _input_data(tmp_path)
+    cache = SolutionCache()
+    small = DecompositionScheduler(data, scheduler_cls=HeuristicScheduler, cluster_size=4, processes=1)
+    large = DecompositionScheduler(data, scheduler_cls=HeuristicScheduler, cluster_size=20, processes=1)
+    CachingScheduler(small, cache).schedule()
+    CachingScheduler(large, cache).schedule()
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    CachingScheduler(DecompositionScheduler(data, scheduler_cls=HeuristicScheduler, cluster_size=4, processes=2), cache).schedule()
+    assert (cache.hits, cache.misses) == (1, 2) # the number of processes does not change the schedule
+
+def test_cache_key_covers_nested_configuration(tmp_path):
+    data = _input_data(tmp_path)
+    cache = SolutionCache()
+    def key(scheduler):
+        return cache.key(data, scheduler.config(), {})
+    assert key(Model3Scheduler(data, "mtz")) != key(Model3Scheduler(data, "lazy"))
+    assert (key(DecompositionScheduler(data, scheduler_params={"tour_constraints": "mtz"}))
+            != key(DecompositionScheduler(data, scheduler_params={"tour_constraints": "lazy"})))
+    assert key(DecompositionScheduler(data, scheduler_cls=HeuristicScheduler)) != key(DecompositionScheduler(data))
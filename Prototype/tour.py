@@ -0,0 +1,278 @@
+import numpy as np
+from input_data import InputData
+from schedule import Schedule, ShopDecision, TravelDecision
+from constants import M
+
+def best_routes(input_data: InputData, kpi_cost: float, kpi_distance: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the lowest weighted time and cost of travel between two shops (inf if no route exists)
+    and the number of the route taking it: (from, to). Among routes of equal weight the fastest and
+    cheapest is taken, so dominated routes are never taken.
+    """
+    times, costs = input_data.route_time_array, input_data.route_cost_array
+    weights = np.where(times < M, kpi_distance * times + kpi_cost * costs, np.inf)
+    weight = weights.min(axis=2)
+    route = np.argmin(np.where(weights <= weight[..., np.newaxis], times + costs, np.inf), axis=2)
+    return weight, route
+
+class Tour:
+    def __init__(self, input_data: InputData, shops: list[int], routes: list[int] = None, purchases: np.ndarray = None,
+                 kpi_cost: float = 1, kpi_distance: float = 1) -> None:
+        """
+        Mutable tour from the origin through shops and back, for local search.
+        Stops, leg routes and purchases are kept in arrays together with the total cost and duration,
+        so that the change of cost and duration of a move is evaluated in constant time
+        (after a move, the first segment reversal evaluated takes time linear in the tour).
+        -----
+        shops: list[int]
+            Indices of the visited shops in order, origin excluded. A shop may be passed more than once
+            (e.g. to change routes), but its purchases are made at its first visit.
+        routes: list[int]
+            Route number (see InputData.route_arcs) of each leg, len(shops) + 1 in total.
+            If not given, each leg takes the route with the lowest weighted time and cost.
+        purchases: np.ndarray
+            Purchased quantities: (item, shop). Nothing is purchased if not given.
+        kpi_cost, kpi_distance: float
+            Weights of cost and time choosing the route of legs created by moves.
+        """
+        self._input_data = input_data
+        self._time = input_data.route_time_array
+        self._cost = input_data.route_cost_array
+        self._prices = np.where(input_data.offer_matrix, input_data.price_matrix, 0)
+        self._best_route = best_routes(input_data, kpi_cost, kpi_distance)[1]
+        self._sums = None # prefix sums of the legs, see _prefix_sums
+
+        self.stops = np.array([0] + list(shops) + [0], dtype=int)
+        if routes is None:
+            routes = self._best_route[self.stops[:-1], self.stops[1:]]
+        self.routes = np.array(routes, dtype=int)
+        if len(self.routes) != len(self.stops) - 1:
+            raise ValueError(f"Expected {len(self.stops) - 1} leg routes, got {len(self.routes)}.")
+        self.purchases = np.zeros(self._prices.shape, dtype=int) if purchases is None else np.array(purchases, dtype=int)
+        self._visits = np.bincount(self.stops[1:-1], minlength=self._prices.shape[1]) # stops at each shop
+
+        # running totals, updated by every move
+        legs = (self.stops[:-1], self.stops[1:], self.routes)
+        self.travel_time = float(self._time[legs].sum())
+        self.travel_cost = float(self._cost[legs].sum())
+        self._shop_cost = (self.purchases * self._prices).sum(axis=0) # purchase cost per shop
+        self.purchase_cost = float(self._shop_cost.sum())
+
+    @classmethod
+    def from_schedule(cls, schedule: Schedule, input_data: InputData, kpi_cost: float = 1, kpi_distance: float = 1):
+        """
+        Returns the tour of a schedule. A route that is not among the routes of input_data is
+        replaced by a route at most as slow and expensive between the same shops.
+        """
+        time, cost = input_data.route_time_array, input_data.route_cost_array
+        stops, routes = [0], []
+        for decision in schedule.travel_decisions:
+            route = decision.route
+            shop_from, shop_to = input_data.get_shop_index(route.shop_from), input_data.get_shop_index(route.shop_to)
+            if shop_from != stops[-1]:
+                raise ValueError(f"Travel from {route.shop_from} does not continue the tour.")
+            same = np.flatnonzero(np.isclose(time[shop_from, shop_to], route.time) & np.isclose(cost[shop_from, shop_to], route.cost))
+            better = np.flatnonzero((time[shop_from, shop_to] <= route.time + 1e-9) & (cost[shop_from, shop_to] <= route.cost + 1e-9))
+            if not len(same) and not len(better):
+                raise ValueError(f"No route from {route.shop_from} to {route.shop_to} in {route.time} for {route.cost}.")
+            routes.append(int(same[0] if len(same) else better[0]))
+            stops.append(shop_to)
+        if stops[-1] != 0:
+            raise ValueError("Schedule does not return to the origin.")
+
+        item_index = {item.name: i for i, item in enumerate(input_data.items)}
+        purchases = np.zeros((len(input_data.items), len(input_data.shops)), dtype=int)
+        for decision in schedule.shop_decisions:
+            purchases[item_index[decision.item.name], input_data.get_shop_index(decision.shop.name)] += decision.quantity
+        return cls(input_data, stops[1:-1], routes or [0], purchases, kpi_cost, kpi_distance)
+
+    def to_schedule(self, metrics = None) -> Schedule:
+        """
+        Returns the schedule visiting the stops in order, purchasing at the first visit of each shop before leaving it.
+        """
+        data = self._input_data
+        decisions = []
+        visited = set()
+        for n, (shop_from, shop_to) in enumerate(zip(self.stops[:-1].tolist(), self.stops[1:].tolist())):
+            if shop_from not in visited:
+                visited.add(shop_from)
+                for i in np.flatnonzero(self.purchases[:, shop_from] > 0):
+                    decisions.append(ShopDecision(data.items[i], data.shops[shop_from], int(self.purchases[i, shop_from])))
+            decisions.extend(TravelDecision(route) for route in data.arc_routes(shop_from, shop_to, int(self.routes[n])))
+        return Schedule(data.origin, decisions, metrics)
+
+    @property
+    def shops(self) -> list[int]:
+        """
+        Returns the visited shops in order, origin excluded.
+        """
+        return self.stops[1:-1].tolist()
+
+    @property
+    def cost(self) -> float:
+        return self.purchase_cost + self.travel_cost
+
+    @property
+    def duration(self) -> float:
+        return self.travel_time
+
+    def __len__(self) -> int:
+        return len(self.stops) - 2
+
+    def _leg(self, shop_from: int, shop_to: int, route: int) -> tuple[float, float]:
+        return self._cost[shop_from, shop_to, route], self._time[shop_from, shop_to, route]
+
+    def _new_leg(self, shop_from: int, shop_to: int) -> tuple[float, float]:
+        return self._leg(shop_from, shop_to, self._best_route[shop_from, shop_to])
+
+    def _old_leg(self, n: int) -> tuple[float, float]:
+        return self._leg(self.stops[n], self.stops[n + 1], self.routes[n])
+
+    def _delta(self, new_legs: list[tuple], old_legs: list[int], purchase_cost: float = 0) -> tuple[float, float]:
+        # (cost, duration) of the new legs (from, to) minus those of the old legs (leg indices)
+        cost, duration = purchase_cost, 0.0
+        for leg in new_legs:
+            leg_cost, leg_time = self._new_leg(*leg)
+            cost, duration = cost + leg_cost, duration + leg_time
+        for n in old_legs:
+            leg_cost, leg_time = self._old_leg(n)
+            cost, duration = cost - leg_cost, duration - leg_time
+        return float(cost), float(duration)
+
+    def _apply(self, delta: tuple[float, float], purchase_cost: float = 0) -> None:
+        self.travel_cost += delta[0] - purchase_cost
+        self.travel_time += delta[1]
+        self.purchase_cost += purchase_cost
+
+    def delta_insert(self, index: int, shop: int) -> tuple[float, float]:
+        """
+        Returns the change of (cost, duration) when shop is inserted at position index of the tour.
+        The inserted shop makes no purchases.
+        """
+        a, b = self.stops[index], self.stops[index + 1]
+        return self._delta([(a, shop), (shop, b)], [index])
+
+    def insert(self, index: int, shop: int) -> None:
+        a, b = self.stops[index], self.stops[index + 1]
+        self._apply(self.delta_insert(index, shop))
+        self.stops = np.insert(self.stops, index + 1, shop)
+        self._sums = None
+        self._visits[shop] += 1
+        self.routes = np.concatenate([self.routes[:index], [self._best_route[a, shop], self._best_route[shop, b]], self.routes[index + 1:]])
+
+    def delta_remove(self, index: int) -> tuple[float, float]:
+        """
+        Returns the change of (cost, duration) when the shop at position index is removed from the tour,
+        together with its purchases unless the shop remains at another stop.
+        """
+        a, shop, b = self.stops[index:index + 3]
+        return self._delta([(a, b)], [index, index + 1], -self._removed_cost(shop))
+
+    def _removed_cost(self, shop: int) -> float:
+        # purchase cost lost when a stop at shop is removed: nothing if the shop is visited again
+        return self._shop_cost[shop] if self._visits[shop] == 1 else 0
+
+    def remove(self, index: int) -> None:
+        a, shop, b = self.stops[index:index + 3]
+        self._apply(self.delta_remove(index), -self._removed_cost(shop))
+        self._visits[shop] -= 1
+        if self._visits[shop] == 0:
+            self.purchases[:, shop] = 0
+            self._shop_cost[shop] = 0
+        self.stops = np.delete(self.stops, index + 1)
+        self._sums = None
+        self.routes = np.concatenate([self.routes[:index], [self._best_route[a, b]], self.routes[index + 2:]])
+
+    def _swapped_legs(self, first: int, second: int) -> tuple[list[tuple], list[int]]:
+        # new legs (from, to) and replaced leg indices when swapping the shops at positions first < second
+        s = self.stops
+        x, y = s[first + 1], s[second + 1]
+        if second == first + 1:
+            return [(s[first], y), (y, x), (x, s[second + 2])], [first, first + 1, second + 1]
+        return [(s[first], y), (y, s[first + 2]), (s[second], x), (x, s[second + 2])], [first, first + 1, second, second + 1]
+
+    def delta_swap(self, first: int, second: int) -> tuple[float, float]:
+        """
+        Returns the change of (cost, duration) when the shops at positions first and second are swapped.
+        """
+        first, second = min(first, second), max(first, second)
+        if first == second:
+            return 0.0, 0.0
+        return self._delta(*self._swapped_legs(first, second))
+
+    def swap(self, first: int, second: int) -> None:
+        first, second = min(first, second), max(first, second)
+        if first == second:
+            return
+        new_legs, old_legs = self._swapped_legs(first, second)
+        self._apply(self._delta(new_legs, old_legs))
+        self.routes[old_legs] = [self._best_route[a, b] for a, b in new_legs]
+        self.stops[[first + 1, second + 1]] = self.stops[[second + 1, first + 1]]
+        self._sums = None
+
+    def _prefix_sums(self) -> tuple[np.ndarray, ...]:
+        # prefix sums of the cost and time of the legs, and of the legs travelled backwards
+        # (on their best route); computed again after a move
+        if self._sums is None:
+            a, b = self.stops[:-1], self.stops[1:]
+            back = self._best_route[b, a]
+            self._sums = tuple(np.concatenate([[0], np.cumsum(values)]) for values in
+                               (self._cost[a, b, self.routes], self._time[a, b, self.routes], self._cost[b, a, back], self._time[b, a, back]))
+        return self._sums
+
+    def delta_reverse(self, first: int, second: int) -> tuple[float, float]:
+        """
+        Returns the change of (cost, duration) when the shops at positions first to second are
+        visited in reverse order (a 2-opt move; travel may be asymmetric).
+        """
+        first, second = min(first, second), max(first, second)
+        if first == second:
+            return 0.0, 0.0
+        s = self.stops
+        cost, duration = self._delta([(s[first], s[second + 1]), (s[first + 1], s[second + 2])], [first, second + 1])
+        # legs within the segment are travelled backwards
+        cost_sums, time_sums, back_cost_sums, back_time_sums = self._prefix_sums()
+        inner = lambda sums: sums[second + 1] - sums[first + 1]
+        return (float(cost + inner(back_cost_sums) - inner(cost_sums)),
+                float(duration + inner(back_time_sums) - inner(time_sums)))
+
+    def reverse(self, first: int, second: int) -> None:
+        first, second = min(first, second), max(first, second)
+        if first == second:
+            return
+        self._apply(self.delta_reverse(first, second))
+        self.stops[first + 1:second + 2] = self.stops[first + 1:second + 2][::-1].copy()
+        self.routes[first:second + 2] = self._best_route[self.stops[first:second + 2], self.stops[first + 1:second + 3]]
+        self._sums = None
+
+    def delta_route(self, leg: int, route: int) -> tuple[float, float]:
+        """
+        Returns the change of (cost, duration) when leg (from the stop at position leg - 1, or the origin
+        for leg 0) takes the given route number instead.
+        """
+        new_cost, new_time = self._leg(self.stops[leg], self.stops[leg + 1], route)
+        old_cost, old_time = self._old_leg(leg)
+        return float(new_cost - old_cost), float(new_time - old_time)
+
+    def change_route(self, leg: int, route: int) -> None:
+        if self._time[self.stops[leg], self.stops[leg + 1], route] >= M:
+            raise ValueError(f"No route {route} from shop {self.stops[leg]} to shop {self.stops[leg + 1]}.")
+        self._apply(self.delta_route(leg, route))
+        self.routes[leg] = route
+        self._sums = None
+
+    def delta_purchases(self, shop: int, amounts: np.ndarray) -> float:
+        """
+        Returns the change of cost when the purchases at shop are replaced by amounts (one per item).
+        Takes time linear in the number of items.
+        """
+        return float(np.dot(amounts, self._prices[:, shop]) - self._shop_cost[shop])
+
+    def set_purchases(self, shop: int, amounts: np.ndarray) -> None:
+        delta = self.delta_purchases(shop, amounts)
+        self.purchase_cost += delta
+        self._shop_cost[shop] += delta
+        self.purchases[:, shop] = amounts
+
+    def __repr__(self) -> str:
+        return f"Tour {self.shops} of cost {round(self.cost, 4)} and duration {round(self.duration, 4)}"
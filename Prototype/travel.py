@@ -0,0 +1,135 @@
+import hashlib
+import os
+import numpy as np
+from input_data import InputData
+from route import Route
+from constants import M, WALKING_DECIMALS
+
+EPSILON = 1e-9 # tolerance when comparing sums of route times and costs
+
+def route_version(input_data: InputData) -> str:
+    """
+    Returns a hash of the data travel depends on: the shops, their locations and the routes.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(([shop.name for shop in input_data.shops], [tuple(shop.location) for shop in input_data.shops],
+                        WALKING_DECIMALS)).encode())
+    for column in (input_data.routes.shop_from, input_data.routes.shop_to, input_data.routes.time, input_data.routes.cost):
+        digest.update(np.ascontiguousarray(column).tobytes())
+    return digest.hexdigest()
+
+class TravelTable:
+    def __init__(self, time: np.ndarray, cost: np.ndarray, via: np.ndarray, route: np.ndarray) -> None:
+        """
+        Pareto-optimal (time, cost) travel between all pairs of shops, chaining routes through
+        intermediate shops that are not visited.
+        -----
+        time, cost: np.ndarray
+            Time and cost of the travel options: (from, to, option), inf if there is no such option.
+            Options of a pair are sorted by time; none is slower and more expensive than another.
+        via: np.ndarray
+            Intermediate shop of each option: (from, to, option), or -1 for a direct route.
+        route: np.ndarray
+            Route number of each direct option (see InputData.get_route): (from, to, option).
+        """
+        self.time = time
+        self.cost = cost
+        self.via = via
+        self.route = route
+
+    @classmethod
+    def compute(cls, input_data: InputData):
+        """
+        Returns the travel table of the input data, computed by a multi-criteria Floyd-Warshall.
+        -----
+        Walking satisfies the triangle inequality, so only shops at either end of a route with a cost
+        can improve travel as intermediate shops; only those are used.
+        """
+        if input_data.travel_table is not None:
+            raise ValueError("Travel table must be computed from input data without travel table")
+        time = np.where(input_data.route_time_array < M, input_data.route_time_array, np.inf)
+        cost = np.where(input_data.route_cost_array < M, input_data.route_cost_array, np.inf)
+        num_shops, num_routes = time.shape[0], time.shape[2]
+        via = np.full(time.shape, -1)
+        route = np.broadcast_to(np.arange(num_routes), time.shape).copy()
+        shops = np.arange(num_shops)
+        time[shops, shops], cost[shops, shops] = np.inf, np.inf
+        time[shops, shops, 0], cost[shops, shops, 0] = 0, 0 # staying costs nothing
+        time, cost, via, route = cls._pareto(time, cost, via, route)
+
+        routes = input_data.routes
+        moving = routes.shop_from != routes.shop_to
+        for m in np.unique(np.concatenate([routes.shop_from[moving], routes.shop_to[moving]])):
+            # travel from i to j via m: combine every option (i, m) with every option (m, j)
+            first = max(int(np.isfinite(time[:, m]).sum(axis=-1).max()), 1) # options are packed at the front
+            second = max(int(np.isfinite(time[m]).sum(axis=-1).max()), 1)
+            shape = (num_shops, num_shops, first * second)
+            via_time = time[:, m, np.newaxis, :first, np.newaxis] + time[np.newaxis, m, :, np.newaxis, :second]
+            via_cost = cost[:, m, np.newaxis, :first, np.newaxis] + cost[np.newaxis, m, :, np.newaxis, :second]
+            time, cost, via, route = cls._pareto(np.concatenate([time, via_time.reshape(shape)], axis=2),
+                                                 np.concatenate([cost, via_cost.reshape(shape)], axis=2),
+                                                 np.concatenate([via, np.full(shape, m)], axis=2),
+                                                 np.concatenate([route, np.full(shape, -1)], axis=2))
+        return cls(time, cost, via, route)
+
+    @staticmethod
+    def _pareto(time, cost, via, route):
+        # keep the options of each pair that are not dominated (the first of identical options), sorted by time;
+        # costs are sums of routes, so they are compared up to rounding
+        order = np.lexsort((cost, time), axis=-1)
+        time, cost, via, route = (np.take_along_axis(a, order, axis=-1) for a in (time, cost, via, route))
+        cheapest_before = np.concatenate([np.full(cost.shape[:-1] + (1,), np.inf), np.minimum.accumulate(cost, axis=-1)[..., :-1]], axis=-1)
+        kept = np.isfinite(time) & (cost < cheapest_before - EPSILON)
+        order = np.argsort(~kept, axis=-1, kind="stable")
+        options = max(int(kept.sum(axis=-1).max()), 1)
+        kept = np.take_along_axis(kept, order, axis=-1)[..., :options]
+        time, cost, via, route = (np.take_along_axis(a, order, axis=-1)[..., :options] for a in (time, cost, via, route))
+        return np.where(kept, time, np.inf), np.where(kept, cost, np.inf), np.where(kept, via, -1), np.where(kept, route, -1)
+
+    @classmethod
+    def load(cls, input_data: InputData, directory: str = None):
+        """
+        Returns the travel table of the input data, read from directory if it was computed before for the
+        same shops and routes, and computed and written to directory otherwise. Not cached if directory is None.
+        """
+        if directory is None:
+            return cls.compute(input_data)
+        file = os.path.join(directory, f"travel_{route_version(input_data)}.npz")
+        if os.path.exists(file):
+            with np.load(file) as data:
+                return cls(data["time"], data["cost"], data["via"], data["route"])
+        table = cls.compute(input_data)
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{file}.{os.getpid()}.tmp.npz"
+        np.savez(temporary, time=table.time, cost=table.cost, via=table.via, route=table.route)
+        os.replace(temporary, file)
+        return table
+
+    def arcs(self) -> list[tuple[int, int, int]]:
+        """
+        Returns list of arcs (from, to, option) of all travel options; self-loops are left out.
+        """
+        exists = np.isfinite(self.time)
+        shops = np.arange(exists.shape[0])
+        exists[shops, shops] = False
+        k, j, p = np.nonzero(exists)
+        return list(zip(k.tolist(), j.tolist(), p.tolist()))
+
+    def routes(self, input_data: InputData, shop_from: int, shop_to: int, option: int) -> list[Route]:
+        """
+        Returns the routes taken by a travel option, in order.
+        """
+        m = self.via[shop_from, shop_to, option]
+        if m < 0:
+            names = input_data.shops
+            return [input_data.get_route(names[shop_from].name, names[shop_to].name, int(self.route[shop_from, shop_to, option]))]
+
+        # the options (from, m) and (m, to) combined at the time may since have been replaced by options at least as good
+        time, cost = self.time[shop_from, shop_to, option], self.cost[shop_from, shop_to, option]
+        total_time = self.time[shop_from, m, :, np.newaxis] + self.time[m, shop_to, np.newaxis, :]
+        total_cost = self.cost[shop_from, m, :, np.newaxis] + self.cost[m, shop_to, np.newaxis, :]
+        first, second = np.argwhere((total_time <= time + EPSILON) & (total_cost <= cost + EPSILON))[0]
+        return self.routes(input_data, shop_from, m, first) + self.routes(input_data, m, shop_to, second)
+
+    def __repr__(self) -> str:
+        return f"TravelTable of {np.isfinite(self.time).sum()} options between {self.time.shape[0]} shops"
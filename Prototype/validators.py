@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from input_data import InputData
 from schedule import Schedule
+from metrics import measure
 
 class ScheduleChecker(ABC):
     def __init__(self, input_data: InputData, schedule: Schedule):
@@ -40,8 +41,10 @@ class AllPurchasesAreOffered(ScheduleChecker):
         """
         Checks that all items are purchased at a shop that sells that item.
         """
+        catalog = self._input_data.catalog
         for decision in self._schedule.shop_decisions:
-            if decision.item.name not in decision.shop.available_products():
+            shop_id = catalog.shop_ids.get(decision.shop.name)
+            if shop_id is None or not catalog.is_offered(shop_id, decision.item.name):
                 return False
         return True
 
@@ -74,8 +77,10 @@ class AllPurchasesWithinStock(ScheduleChecker):
         """
         Checks that no purchase made exceeds the stock of the product at that shop.
         """
+        catalog = self._input_data.catalog
         for decision in self._schedule.shop_decisions:
-            if decision.quantity > decision.shop.get_stock(decision.item.name):
+            shop_id = catalog.shop_ids.get(decision.shop.name)
+            if shop_id is None or decision.quantity > catalog.get_stock(shop_id, decision.item.name):
                 return False
         return True
 
@@ -92,8 +97,18 @@ class ScheduleValidator:
             AllPurchasesWithinStock
         ]
 
+    def results(self) -> dict[str, bool]:
+        """
+        Returns dictionary of check results: (checker name, passed).
+        Validation is timed in the metrics attached to the schedule, if any.
+        """
+        results = dict()
+        with measure(self._schedule.metrics, "validate"):
+            for checker_cls in self._checker_classes:
+                checker = checker_cls(schedule=self._schedule, input_data=self._input_data)
+                results[checker_cls.__name__] = checker.check()
+        return results
+
     def validate(self) -> None:
-        for checker_cls in self._checker_classes:
-            checker = checker_cls(schedule=self._schedule, input_data=self._input_data)
-            is_valid = checker.check()
-            print(f"{checker_cls.__name__:30s} : {'PASS' if is_valid else 'FAIL'}")
\ No newline at end of file
+        for name, is_valid in self.results().items():
+            print(f"{name:30s} : {'PASS' if is_valid else 'FAIL'}")
\ No newline at end of file